@@ -5,3 +5,7 @@ class AuthConfig(AppConfig):
     name = "apps.auth"
     label = "axi_auth"  # evitar conflicto con django.contrib.auth
     verbose_name = "Autenticación"
+
+    def ready(self):
+        # Connects the token cache invalidation signals in every process (web, Celery, shell).
+        from . import tokens  # noqa: F401
@@ -1,7 +1,5 @@
 from rest_framework.authentication import BaseAuthentication
-from rest_framework.exceptions import AuthenticationFailed
-from django.utils import timezone
-from .models import OAuthToken
+from .tokens import resolve_token
 
 
 class OAuth2Authentication(BaseAuthentication):
@@ -17,33 +15,11 @@ class OAuth2Authentication(BaseAuthentication):
 
         token = auth_header[7:]  # Remove 'Bearer ' prefix
 
-        try:
-            oauth_token = OAuthToken.objects.select_related('application').get(
-                token=token,
-                expires_at__gt=timezone.now()
-            )
-
-            # Create a simple user representation for OAuth2
-            class OAuth2User:
-                is_authenticated = True
-                is_anonymous = False
-                id = f"oauth_{oauth_token.application.client_id}"
-                username = f"oauth_user_{oauth_token.application.name}"
-                email = f"{oauth_token.application.client_id}@oauth.local"
-
-                def __str__(self):
-                    return self.username
-
-            user = OAuth2User()
-
-            # Attach token info to user for access in views
-            user.oauth_token = oauth_token
-            user.oauth_scopes = oauth_token.scope.split(',') if oauth_token.scope else []
-
-            return (user, oauth_token)
-
-        except OAuthToken.DoesNotExist:
+        # Already resolved (and cached) by OAuth2AuthenticationMiddleware on protected paths
+        user = resolve_token(token)
+        if user is None:
             return None
+        return (user, user.oauth_token)
 
     def authenticate_header(self, request):
-        return 'Bearer'
\ No newline at end of file
+        return 'Bearer'
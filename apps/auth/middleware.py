@@ -1,7 +1,6 @@
 from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
-from django.utils import timezone
-from .models import OAuthToken
+from .tokens import resolve_token
 
 
 class OAuth2AuthenticationMiddleware(MiddlewareMixin):
@@ -41,34 +40,19 @@ class OAuth2AuthenticationMiddleware(MiddlewareMixin):
 
         token = auth_header[7:]  # Remove 'Bearer ' prefix
 
-        try:
-            oauth_token = OAuthToken.objects.select_related('application').get(
-                token=token,
-                expires_at__gt=timezone.now()
-            )
-
-            # Attach token info to request
-            request.oauth_token = oauth_token
-            request.oauth_scopes = oauth_token.scope.split(',') if oauth_token.scope else []
-
-            # Set a dummy user for compatibility with IsAuthenticated
-            # In a real implementation, you'd associate tokens with users
-            from django.contrib.auth.models import AnonymousUser
-            if not hasattr(request, 'user') or request.user.is_anonymous:
-                # Create a simple user representation for OAuth2
-                class OAuth2User:
-                    is_authenticated = True
-                    is_anonymous = False
-                    id = f"oauth_{oauth_token.application.client_id}"
-                    username = f"oauth_user_{oauth_token.application.name}"
-                    email = f"{oauth_token.application.client_id}@oauth.local"
-
-                request.user = OAuth2User()
-
-        except OAuthToken.DoesNotExist:
+        user = resolve_token(token)
+        if user is None:
             return JsonResponse({
                 'error': 'invalid_token',
                 'message': 'Invalid or expired token'
             }, status=401)
 
-        return None
\ No newline at end of file
+        # Attach token info to request
+        request.oauth_token = user.oauth_token
+        request.oauth_scopes = user.oauth_scopes
+
+        # OAuth2 clients have no Django user; keep IsAuthenticated working
+        if not hasattr(request, 'user') or request.user.is_anonymous:
+            request.user = user
+
+        return None
@@ -0,0 +1,123 @@
+"""Bearer token resolution shared by the OAuth2 middleware and DRF authentication.
+
+A validated token is kept in a per-process TLRU cache and in the Django cache
+(Redis when configured) until its ``expires_at``, so the middleware and
+``OAuth2Authentication`` resolve it with a dictionary lookup and a request
+costs at most one query. Saving or deleting an ``OAuthToken`` (including
+``revoke_token``) invalidates both layers. Other processes drop their local
+copy after ``OAUTH_TOKEN_LOCAL_TTL`` seconds at the latest. When the Django
+cache is down, tokens are resolved from the database.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from typing import List
+
+from cachetools import TLRUCache
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import OAuthToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 10_000
+DEFAULT_LOCAL_TTL = 30.0
+
+
+class OAuth2User:
+    """Request user for a client-credentials token: there is no Django user behind it."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, oauth_token: OAuthToken):
+        application = oauth_token.application
+        self.id = f"oauth_{application.client_id}"
+        self.username = f"oauth_user_{application.name}"
+        self.email = f"{application.client_id}@oauth.local"
+        self.oauth_token = oauth_token
+        self.oauth_scopes: List[str] = oauth_token.scope.split(',') if oauth_token.scope else []
+
+    def __str__(self):
+        return self.username
+
+
+def _cache_key(token: str) -> str:
+    # Raw tokens are credentials: keep them out of Redis keys.
+    return f"auth:oauth_token:{hashlib.sha256(token.encode()).hexdigest()}"
+
+
+class TokenCache:
+    def __init__(self, maxsize: int, local_ttl: float):
+        self.local_ttl = local_ttl
+        self._lock = threading.Lock()
+        self._entries = TLRUCache(maxsize=maxsize, ttu=self._expires, timer=time.time)
+
+    def _expires(self, token: str, user: OAuth2User, now: float) -> float:
+        return min(user.oauth_token.expires_at.timestamp(), now + self.local_ttl)
+
+    def resolve(self, token: str) -> OAuth2User | None:
+        """The user for a valid, unexpired ``token``; None otherwise (never cached)."""
+        with self._lock:
+            user = self._entries.get(token)
+        if user is not None:
+            return user
+        try:
+            user = cache.get(_cache_key(token))
+        except Exception as e:
+            logger.warning(f"Token cache read failed, using the database - error: {e}")
+            user = None
+        if user is None or user.oauth_token.expires_at <= timezone.now():
+            try:
+                oauth_token = OAuthToken.objects.select_related('application').get(
+                    token=token,
+                    expires_at__gt=timezone.now()
+                )
+            except OAuthToken.DoesNotExist:
+                return None
+            user = OAuth2User(oauth_token)
+            ttl = (oauth_token.expires_at - timezone.now()).total_seconds()
+            try:
+                cache.set(_cache_key(token), user, max(int(ttl), 1))
+            except Exception as e:
+                logger.warning(f"Token cache write failed - error: {e}")
+        with self._lock:
+            self._entries[token] = user
+        return user
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+        try:
+            cache.delete(_cache_key(token))
+        except Exception as e:
+            # The shared copy still expires with the token; other processes drop theirs within local_ttl.
+            logger.error(f"Token cache invalidation failed - error: {e}")
+
+
+token_cache = TokenCache(
+    maxsize=getattr(settings, "OAUTH_TOKEN_CACHE_SIZE", DEFAULT_CACHE_SIZE),
+    local_ttl=getattr(settings, "OAUTH_TOKEN_LOCAL_TTL", DEFAULT_LOCAL_TTL),
+)
+
+
+def resolve_token(token: str) -> OAuth2User | None:
+    return token_cache.resolve(token)
+
+
+def revoke_token(token: str) -> bool:
+    """Delete ``token``; the signal below drops it from both caches. True if it existed."""
+    deleted, _ = OAuthToken.objects.filter(token=token).delete()
+    return bool(deleted)
+
+
+@receiver([post_save, post_delete], sender=OAuthToken)
+def _invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.token)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import ping, oauth_token_view
+from .views import ping, oauth_token_view, oauth_revoke_view
 
 urlpatterns = [
     path("auth/ping", ping, name="auth_ping"),
     path("oauth/token", oauth_token_view, name="oauth_token"),
+    path("oauth/revoke", oauth_revoke_view, name="oauth_revoke"),
 ]
@@ -7,6 +7,7 @@ from datetime import timedelta
 import secrets
 
 from .models import OAuthApplication, OAuthToken
+from .tokens import revoke_token
 
 
 @api_view(["GET"])  # ping mínimo
@@ -53,3 +54,20 @@ def oauth_token_view(request):
     })
 
 
+@api_view(["POST"])  # OAuth2 token revocation (RFC 7009, minimal)
+@permission_classes([AllowAny])
+def oauth_revoke_view(request):
+    data = request.data or {}
+    client_id = data.get("client_id")
+    client_secret = data.get("client_secret")
+    token = data.get("token")
+
+    if not client_id or not client_secret or not token:
+        return Response({"error": "invalid_request"}, status=status.HTTP_400_BAD_REQUEST)
+    if not OAuthApplication.objects.filter(client_id=client_id, client_secret=client_secret).exists():
+        return Response({"error": "invalid_client"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    # Only the client's own tokens; unknown tokens still answer 200 (RFC 7009)
+    if OAuthToken.objects.filter(token=token, application__client_id=client_id).exists():
+        revoke_token(token)
+    return Response(status=status.HTTP_200_OK)
@@ -0,0 +1,204 @@
+"""Native async variants of the dataset read endpoints, for ASGI deployments.
+
+Enabled with ``DATASET_ASYNC_VIEWS`` (see ``urls.py``), they serve the same
+paths and payloads as the DRF views in ``views.py``. Queries use the async
+ORM, storage reads run in worker threads, and parsing or analytics go through
+``compute_pool.arun``, so a slow GCS read or a long correlation never blocks the
+event loop and one process can keep many such requests in flight.
+
+Authentication is what ``OAuth2AuthenticationMiddleware`` established for the
+request; DRF (and therefore its authentication classes) is not involved.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, NotAuthenticated
+
+from .compute import compute_pool, correlation_result, job_cost, summary_result, trend_result
+from .errors import custom_exception_handler
+from .health import integration_health
+from .loaders import cached_head, dataset_shape
+from .models import DataFile, DatasetStats, TrendRollup
+from .preview import read_preview
+from .renderers import FastJSONRenderer
+from .rollups import rollup_covers, rollup_trend
+from .serializers import TrendParamsSerializer
+from .services import trend_payload
+from .views import _json_error, _summary, _trend_error
+
+
+def _json(data, status: int = 200) -> HttpResponse:
+    return HttpResponse(FastJSONRenderer.dumps(data), content_type="application/json", status=status)
+
+
+def _bad_request(message) -> HttpResponse:
+    return _json({"error": {"code": "bad_request", "message": message}}, status=400)
+
+
+def _error_response(exc: Exception) -> HttpResponse:
+    """The response the DRF views would give for ``exc`` (same body and ``Retry-After``)."""
+    response = custom_exception_handler(exc, {})
+    out = _json(response.data, status=response.status_code)
+    for header in ("Retry-After", "WWW-Authenticate"):
+        if header in response:
+            out[header] = response[header]
+    return out
+
+
+def _in_thread(fn, *args, **kwargs):
+    """Run blocking storage I/O off the event loop."""
+    return sync_to_async(fn, thread_sensitive=False)(*args, **kwargs)
+
+
+async def _get_datafile(request, id: int) -> DataFile:
+    if getattr(request, "oauth_token", None) is None:
+        raise NotAuthenticated()
+    datafile = await DataFile.objects.filter(pk=id).afirst()
+    if datafile is None:
+        raise Http404("No DataFile matches the given query.")
+    return datafile
+
+
+@require_GET
+async def dataset_metrics(request, id: int):
+    try:
+        datafile = await _get_datafile(request, id)
+    except (APIException, Http404) as e:
+        return _error_response(e)
+    if datafile.row_count is not None and datafile.column_names is not None:
+        row_count, schema = datafile.row_count, datafile.column_names
+    else:
+        try:
+            row_count, schema = await _in_thread(dataset_shape, datafile)
+        except Exception as e:
+            return _bad_request(str(e))
+        await datafile.astore_shape(int(row_count), schema)
+
+    if datafile.file_size is not None:
+        size_bytes = datafile.file_size
+    else:
+        size_bytes = await _in_thread(lambda: datafile.file.size)
+    metrics = {
+        "rows": int(row_count),
+        "columns": int(len(schema)),
+        "size_bytes": size_bytes,
+        "created_at": datafile.created_at,
+        "schema": schema,
+    }
+    return _json({"id": datafile.id, "metrics": metrics})
+
+
+@require_GET
+async def data_preview(request, id: int):
+    try:
+        datafile = await _get_datafile(request, id)
+    except (APIException, Http404) as e:
+        return _error_response(e)
+    try:
+        df = cached_head(datafile, 5)
+        if df is None:
+            df = await _in_thread(read_preview, datafile, 5)
+    except pd.errors.EmptyDataError:
+        return _bad_request("Empty file")
+    except pd.errors.ParserError:
+        return _bad_request("Invalid CSV format")
+    rows = df.head(5).to_dict(orient="records")
+    return _json({"id": datafile.id, "rows": rows})
+
+
+@require_GET
+async def data_summary(request, id: int):
+    try:
+        datafile = await _get_datafile(request, id)
+    except (APIException, Http404) as e:
+        return _error_response(e)
+    stats = await DatasetStats.afresh_for(datafile)
+    if stats is None:
+        try:
+            result = await compute_pool.arun(summary_result, datafile, cost=job_cost(datafile))
+        except APIException as e:
+            return _error_response(e)
+        except Exception as e:
+            return _bad_request(str(e))
+        stats = await DatasetStats.astore(datafile, result)
+    return _json({"id": datafile.id, "summary": _summary(stats)})
+
+
+@require_GET
+async def data_correlation(request, id: int):
+    try:
+        datafile = await _get_datafile(request, id)
+    except (APIException, Http404) as e:
+        return _error_response(e)
+    cols = request.GET.get("cols")
+    cols = [c.strip() for c in cols.split(",")] if cols else None
+    try:
+        corr = await compute_pool.arun(correlation_result, datafile, cols, cost=job_cost(datafile))
+    except APIException as e:
+        return _error_response(e)
+    except Exception as e:
+        return _bad_request(str(e))
+    return _json({"id": datafile.id, "correlation": corr})
+
+
+@require_GET
+async def data_trend(request, id: int):
+    try:
+        datafile = await _get_datafile(request, id)
+    except (APIException, Http404) as e:
+        return _error_response(e)
+    params = TrendParamsSerializer(data=request.GET)
+    try:
+        params.is_valid(raise_exception=True)
+    except APIException as e:
+        return _error_response(e)
+    date_col = params.validated_data['date']
+    value_cols = params.validated_data.get('value') or []
+    freq = params.validated_data['freq']
+    aggs = params.validated_data['agg']
+    error = _trend_error(value_cols, aggs)
+    if error:
+        return _json_error(error, status=400)
+    rollup = await TrendRollup.afresh_for(datafile, date_col)
+    if rollup is not None and rollup_covers(rollup.data, value_cols, freq, aggs):
+        try:
+            out = rollup_trend(rollup.data, value_cols, freq, aggs)
+        except ValueError as e:
+            return _json_error(str(e), status=400)
+        return JsonResponse({"id": datafile.id, "trend": trend_payload(out, value_cols, aggs)})
+    try:
+        out = await compute_pool.arun(trend_result, datafile, date_col, value_cols, freq, aggs,
+                                      cost=job_cost(datafile))
+    except APIException as e:
+        return _error_response(e)
+    except Exception as e:
+        return _json_error(str(e), status=400)
+    return JsonResponse({"id": datafile.id, "trend": trend_payload(out, value_cols, aggs)})
+
+
+@require_GET
+async def get_download_url(request, id: int):
+    try:
+        datafile = await _get_datafile(request, id)
+    except (APIException, Http404) as e:
+        return _error_response(e)
+    # On GCS the URL is a signed URL, which may need credentials refreshed over the network.
+    url = await _in_thread(lambda: datafile.file.url)
+    return _json({
+        "download_url": request.build_absolute_uri(url),
+        "expires_in": 900,
+        "filename": datafile.file.name,
+        "type": "direct",
+        "storage": "local"
+    })
+
+
+@require_GET
+async def health_integrations(request):
+    # Only waits (in a thread) when a target has never been probed.
+    return _json(await asyncio.to_thread(integration_health.check))
@@ -0,0 +1,197 @@
+"""Per-worker LRU cache of parsed dataset tables, bounded by Arrow buffer bytes."""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+import django
+import pyarrow as pa
+from cachetools import LRUCache
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 << 20
+DEFAULT_SORT_MAX_BYTES = 64 << 20
+
+
+def cache_key(datafile) -> tuple:
+    return (datafile.id, datafile.file_size, datafile.created_at)
+
+
+@dataclass
+class _Entry:
+    table: pa.Table
+    complete: bool
+    absent: frozenset = field(default_factory=frozenset)
+
+    def covers(self, columns: List[str] | None) -> bool:
+        if self.complete:
+            return True
+        if columns is None:
+            return False
+        names = set(self.table.column_names)
+        return all(c in names or c in self.absent for c in columns)
+
+    def project(self, columns: List[str] | None) -> pa.Table:
+        if columns is None:
+            return self.table
+        names = set(self.table.column_names)
+        return self.table.select([c for c in columns if c in names])
+
+
+class _TableLRU(LRUCache):
+    def __init__(self, maxsize, on_evict):
+        super().__init__(maxsize=maxsize, getsizeof=lambda entry: entry.table.nbytes)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, entry = super().popitem()
+        self._on_evict(key, entry)
+        return key, entry
+
+
+class TableCache:
+    """Maps ``(DataFile.id, file_size, created_at)`` to the columns loaded so far.
+
+    Requests for columns not yet cached load only those columns and merge them
+    into the existing entry, so projected loads from different endpoints share it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._entries = _TableLRU(max_bytes, self._record_eviction)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _record_eviction(self, key, entry: _Entry) -> None:
+        self.evictions += 1
+        logger.debug(f"Table cache eviction - key: {key}, bytes: {entry.table.nbytes}")
+
+    def get_or_load(self, key: tuple, columns: List[str] | None,
+                    loader: Callable[[List[str] | None], pa.Table]) -> pa.Table:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.covers(columns):
+                self.hits += 1
+                return entry.project(columns)
+            self.misses += 1
+
+        if entry is None or columns is None:
+            table = loader(columns)
+            absent = frozenset(columns) - set(table.column_names) if columns is not None else frozenset()
+            entry = _Entry(table, complete=columns is None, absent=absent)
+        else:
+            names = set(entry.table.column_names)
+            missing = [c for c in columns if c not in names and c not in entry.absent]
+            extra = loader(missing)
+            table = entry.table
+            for name in extra.column_names:
+                table = table.append_column(extra.schema.field(name), extra.column(name))
+            entry = _Entry(table, complete=False, absent=entry.absent | (frozenset(missing) - set(extra.column_names)))
+
+        with self._lock:
+            self._entries.pop(key, None)
+            try:
+                self._entries[key] = entry
+            except ValueError:
+                # Larger than the whole budget: serve it without caching.
+                pass
+        return entry.project(columns)
+
+    def lookup(self, key: tuple, columns: List[str] | None) -> pa.Table | None:
+        """Return the projected table if every column is already cached, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.covers(columns):
+                return None
+            self.hits += 1
+            return entry.project(columns)
+
+    def peek(self, key: tuple) -> pa.Table | None:
+        """Return the full cached table without loading or touching hit counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry.table if entry is not None and entry.complete else None
+
+    def invalidate(self, dataset_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._entries.keys() if k[0] == dataset_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def resize(self, max_bytes: int) -> None:
+        """Set a new budget; cached tables are dropped. 0 disables caching."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._entries = _TableLRU(max_bytes, self._record_eviction)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": int(self._entries.currsize),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SortOrderCache:
+    """LRU of full sort permutations for repeated ``sort=`` requests.
+
+    Keys are ``(cache_key(datafile), filters, sort_expr)``. A permutation is only
+    worth computing once the same key has been asked for ``min_uses`` times;
+    before that, callers use a top-k selection for the requested page.
+    """
+
+    def __init__(self, max_bytes: int, min_uses: int = 2):
+        self._lock = threading.RLock()
+        self._orders = LRUCache(maxsize=max_bytes, getsizeof=lambda order: order.nbytes)
+        self._uses = LRUCache(maxsize=4096)
+        self.min_uses = min_uses
+
+    def get(self, key) -> pa.Array | None:
+        with self._lock:
+            return self._orders.get(key)
+
+    def wants(self, key) -> bool:
+        with self._lock:
+            uses = self._uses.get(key, 0) + 1
+            self._uses[key] = uses
+            return uses >= self.min_uses
+
+    def put(self, key, order: pa.Array) -> None:
+        with self._lock:
+            try:
+                self._orders[key] = order
+            except ValueError:
+                pass
+
+    def invalidate(self, dataset_id: int) -> None:
+        with self._lock:
+            for cache in (self._orders, self._uses):
+                for key in [k for k in cache.keys() if k[0][0] == dataset_id]:
+                    del cache[key]
+
+
+table_cache = TableCache(getattr(settings, "DATASET_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+sort_cache = SortOrderCache(getattr(settings, "DATASET_SORT_CACHE_MAX_BYTES", DEFAULT_SORT_MAX_BYTES))
+
+
+def init_pool_process(max_bytes: int) -> None:
+    """Initializer of compute pool children: Django setup, then this process's share of the cache budget.
+
+    It lives here rather than in ``compute`` because unpickling it must not
+    import the models before ``django.setup()`` has run.
+    """
+    django.setup()
+    table_cache.resize(max_bytes)
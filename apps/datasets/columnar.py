@@ -0,0 +1,96 @@
+"""Columnar (Parquet) sidecars for uploaded CSV datasets."""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# Type inference runs on the first block, so keep it large enough to be representative.
+CSV_BLOCK_SIZE = 64 << 20
+# Small row groups let filtered scans and index lookups skip most of the file.
+ROW_GROUP_ROWS = 128 * 1024
+
+
+def columnar_name(csv_name: str) -> str:
+    return f"{os.path.splitext(csv_name)[0]}.parquet"
+
+
+def local_path(fieldfile) -> str | None:
+    try:
+        return fieldfile.path
+    except NotImplementedError:
+        return None
+
+
+@contextmanager
+def parquet_source(fieldfile):
+    """Arrow input for a stored Parquet file: memory-mapped when local."""
+    path = local_path(fieldfile)
+    if path:
+        with pa.memory_map(path) as source:
+            yield source
+        return
+    with fieldfile.open("rb") as f:
+        yield pa.PythonFile(f, mode="r")
+
+
+def _is_temporal(dtype: pa.DataType) -> bool:
+    return pa.types.is_timestamp(dtype) or pa.types.is_date(dtype) or pa.types.is_time(dtype)
+
+
+def open_csv_stream(f, columns: list[str] | None = None) -> pacsv.CSVStreamingReader:
+    """Open a batch-by-batch CSV reader whose types match ``pd.read_csv``.
+
+    pandas leaves date-like columns as strings and reads empty fields as
+    missing, so temporal columns inferred by Arrow are read back as strings and
+    empty strings become nulls to keep both paths interchangeable.
+    """
+    read_options = pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+    reader = pacsv.open_csv(f, read_options=read_options,
+                            convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+    overrides = {field.name: pa.string() for field in reader.schema if _is_temporal(field.type)}
+    if not overrides and columns is None:
+        return reader
+    f.seek(0)
+    convert_options = pacsv.ConvertOptions(
+        strings_can_be_null=True,
+        column_types=overrides,
+        include_columns=[c for c in columns if c in reader.schema.names] if columns is not None else None,
+    )
+    return pacsv.open_csv(f, read_options=read_options, convert_options=convert_options)
+
+
+def build_columnar_sidecar(datafile, consumers: Iterable[Callable[[pa.RecordBatch], None]] = ()) -> str | None:
+    """Convert the uploaded CSV to Parquet next to it and record it on ``datafile``.
+
+    Each record batch is also handed to ``consumers`` so other per-upload
+    artifacts can be built in the same pass over the file.
+    """
+    consumers = list(consumers)
+    with tempfile.NamedTemporaryFile(suffix=".parquet") as tmp:
+        try:
+            with datafile.file.open("rb") as f:
+                reader = open_csv_stream(f)
+                with pq.ParquetWriter(tmp.name, reader.schema) as writer:
+                    for batch in reader:
+                        writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+                        for consume in consumers:
+                            consume(batch)
+        except (pa.ArrowInvalid, ValueError) as e:
+            logger.warning(f"Columnar conversion skipped - dataset_id: {datafile.id}, error: {e}")
+            return None
+        tmp.seek(0)
+        name = default_storage.save(columnar_name(datafile.file.name), File(tmp))
+    datafile.columnar_file.name = name
+    datafile.save(update_fields=["columnar_file"])
+    return name
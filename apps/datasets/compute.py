@@ -0,0 +1,279 @@
+"""Process pool for CPU-heavy analytics, with admission control.
+
+Summary, correlation, trend and cohort computations run in a small pool of
+worker processes, so they neither hold the request worker's GIL nor tie up the
+threads serving cheap endpoints. Each submission carries an estimated cost
+(the bytes of dataset it reads). When the pool already holds ``max_queue`` jobs
+or ``max_cost`` bytes of work, new jobs are refused with 429 and a
+``Retry-After`` derived from the measured throughput instead of queueing
+without bound.
+
+Each child gets ``DATASET_COMPUTE_CACHE_MAX_BYTES / workers`` of table cache
+instead of a full ``DATASET_CACHE_MAX_BYTES``, so an instance caches at most the
+sum of both settings. Every child is a full Django interpreter: an instance runs
+gunicorn workers x ``workers`` of them, hence one per web worker by default.
+
+A job that outlives ``timeout`` is interrupted in its child by ``SIGALRM`` (once
+control returns to Python). Its caller has stopped waiting by then, and the
+pool it ran in is replaced so later jobs do not queue behind it; the old
+children exit when their current job ends.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List
+
+from django.conf import settings
+from rest_framework.exceptions import APIException, Throttled
+
+from .cache import init_pool_process
+from .loaders import dataset_schema, iter_batches, load_dataframe, load_table, use_streaming
+from .services import COHORT_COLUMNS, MERGEABLE_AGGS, cohort_retention, compute_correlation, compute_trend
+from .streaming import DatasetStatsAccumulator, correlation_columns, streaming_correlation, streaming_trend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_QUEUE = 8
+DEFAULT_MAX_COST_BYTES = 2 << 30
+DEFAULT_CACHE_MAX_BYTES = 128 << 20
+DEFAULT_TIMEOUT = 110.0
+# Starting estimate until real jobs have been timed.
+INITIAL_THROUGHPUT_BYTES = 64 << 20
+MAX_RETRY_AFTER = 300
+
+
+class ComputeSaturated(Throttled):
+    default_detail = "Analytics workers are busy."
+    default_code = "compute_saturated"
+
+
+class ComputeUnavailable(APIException):
+    status_code = 503
+    default_detail = "Analytics workers are unavailable."
+    default_code = "compute_unavailable"
+
+
+class JobExpired(Exception):
+    pass
+
+
+def _expire(signum, frame):
+    raise JobExpired("Analytics job exceeded its deadline.")
+
+
+def _timed(fn: Callable, args: tuple, deadline: float | None = None) -> tuple[Any, float]:
+    # The deadline is only set in pool children, where jobs run on the main thread.
+    if deadline:
+        signal.signal(signal.SIGALRM, _expire)
+        signal.setitimer(signal.ITIMER_REAL, deadline)
+    started = time.perf_counter()
+    try:
+        return fn(*args), time.perf_counter() - started
+    finally:
+        if deadline:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class ComputePool:
+    """Bounded per-worker process pool; ``workers=0`` runs jobs inline with the same accounting."""
+
+    def __init__(self, workers: int, max_queue: int, max_cost: int, timeout: float, cache_bytes: int = 0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.cache_bytes = cache_bytes
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._jobs: Dict[Future, ProcessPoolExecutor] = {}
+        self._pending = 0
+        self._cost = 0
+        self._throughput = float(INITIAL_THROUGHPUT_BYTES)
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: children must not inherit DB sockets or Arrow thread
+                # pools, and they split the pool's cache budget between them.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_pool_process, initargs=(self.cache_bytes // self.workers,),
+                )
+            return self._executor
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle(self, executor: ProcessPoolExecutor) -> None:
+        """Send later jobs to a new pool; ``executor``'s children exit once their jobs end or expire."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False)
+        logger.warning("Compute job timed out, pool replaced")
+
+    def retry_after(self) -> int:
+        """Seconds until the work in flight should have drained, at the measured throughput."""
+        seconds = self._cost / (self._throughput * max(self.workers, 1))
+        return int(min(max(math.ceil(seconds), 1), MAX_RETRY_AFTER))
+
+    def _admit(self, cost: int) -> None:
+        with self._lock:
+            # A single job is always admitted on an idle pool, however large.
+            if self._pending and (self._pending >= self.max_queue or self._cost + cost > self.max_cost):
+                self.rejected += 1
+                raise ComputeSaturated(wait=self.retry_after())
+            self._pending += 1
+            self._cost += cost
+
+    def _release(self, cost: int, elapsed: float | None) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._cost -= cost
+            self.completed += 1
+            if elapsed and cost:
+                self._throughput = 0.8 * self._throughput + 0.2 * (cost / elapsed)
+
+    def _submit(self, fn: Callable, args: tuple, cost: int) -> Future:
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_timed, fn, args, self.timeout)
+        except RuntimeError as e:
+            # Broken, or replaced by another thread since _get_executor().
+            self._release(cost, None)
+            if isinstance(e, BrokenProcessPool):
+                self._reset()
+            raise ComputeUnavailable()
+        with self._lock:
+            self._jobs[future] = executor
+
+        def done(f):
+            with self._lock:
+                self._jobs.pop(f, None)
+            ok = not f.cancelled() and f.exception() is None
+            self._release(cost, f.result()[1] if ok else None)
+
+        # Released when the job finishes, not when the caller stops waiting,
+        # so timed-out jobs still count against later admissions.
+        future.add_done_callback(done)
+        return future
+
+    def _timed_out(self, future: Future) -> None:
+        with self._lock:
+            executor = self._jobs.get(future)
+        if executor is not None:
+            self._recycle(executor)
+
+    def _broken(self) -> ComputeUnavailable:
+        logger.warning("Compute pool broken, restarting")
+        self._reset()
+        return ComputeUnavailable()
+
+    def run(self, fn: Callable, *args, cost: int = 0) -> Any:
+        """Run ``fn(*args)`` in the pool and wait for its result.
+
+        ``fn`` and its arguments must be picklable (module-level functions,
+        model instances, plain values). Exceptions raised by ``fn`` are re-raised here.
+        """
+        self._admit(cost)
+        if not self.workers:
+            elapsed = None
+            try:
+                result, elapsed = _timed(fn, args)
+                return result
+            finally:
+                self._release(cost, elapsed)
+        future = self._submit(fn, args, cost)
+        try:
+            return future.result(timeout=self.timeout)[0]
+        except FutureTimeoutError:
+            self._timed_out(future)
+            raise ComputeUnavailable("Analytics job timed out.")
+        except BrokenProcessPool:
+            raise self._broken()
+
+    async def arun(self, fn: Callable, *args, cost: int = 0) -> Any:
+        """Awaitable ``run``: the event loop is never blocked while the job runs."""
+        self._admit(cost)
+        if not self.workers:
+            elapsed = None
+            try:
+                result, elapsed = await asyncio.to_thread(_timed, fn, args)
+                return result
+            finally:
+                self._release(cost, elapsed)
+        future = self._submit(fn, args, cost)
+        try:
+            return (await asyncio.wait_for(asyncio.wrap_future(future), self.timeout))[0]
+        except asyncio.TimeoutError:
+            self._timed_out(future)
+            raise ComputeUnavailable("Analytics job timed out.")
+        except BrokenProcessPool:
+            raise self._broken()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "cost_bytes": self._cost,
+                "throughput_bytes_per_s": int(self._throughput),
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+def job_cost(datafile) -> int:
+    return datafile.file_size or 0
+
+
+def summary_result(datafile) -> Dict[str, Any]:
+    batches = iter_batches(datafile) if use_streaming(datafile) else load_table(datafile).to_batches()
+    return DatasetStatsAccumulator().consume(batches).result()
+
+
+def correlation_result(datafile, cols: List[str] | None) -> Dict[str, Dict[str, float]]:
+    if use_streaming(datafile):
+        numeric = correlation_columns(dataset_schema(datafile), cols)
+        return streaming_correlation(iter_batches(datafile, numeric), numeric)
+    return compute_correlation(load_dataframe(datafile, cols), cols)
+
+
+def trend_result(datafile, date_col: str, value_cols: List[str], freq: str, aggs: List[str]) -> Dict[str, Any]:
+    columns = [date_col, *value_cols]
+    # Medians and percentiles need every value of a period at once; those load just these columns.
+    if use_streaming(datafile) and all(agg in MERGEABLE_AGGS for agg in aggs):
+        return streaming_trend(dataset_schema(datafile), iter_batches(datafile, columns),
+                               date_col=date_col, value_cols=value_cols, freq=freq, aggs=aggs)
+    return compute_trend(load_dataframe(datafile, columns), date_col=date_col, value_cols=value_cols, freq=freq,
+                         aggs=aggs)
+
+
+def cohort_result(datafile, freq: str) -> Dict[str, Any]:
+    if use_streaming(datafile):
+        return cohort_retention(iter_batches(datafile, COHORT_COLUMNS), freq)
+    return cohort_retention(load_table(datafile, COHORT_COLUMNS).to_batches(), freq)
+
+
+compute_pool = ComputePool(
+    workers=getattr(settings, "DATASET_COMPUTE_WORKERS", DEFAULT_WORKERS),
+    max_queue=getattr(settings, "DATASET_COMPUTE_MAX_QUEUE", DEFAULT_MAX_QUEUE),
+    max_cost=getattr(settings, "DATASET_COMPUTE_MAX_COST_BYTES", DEFAULT_MAX_COST_BYTES),
+    timeout=getattr(settings, "DATASET_COMPUTE_TIMEOUT", DEFAULT_TIMEOUT),
+    cache_bytes=getattr(settings, "DATASET_COMPUTE_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES),
+)
@@ -28,6 +28,8 @@ def _status_code_to_code(st: int) -> str:
     if st == 403: return "forbidden"
     if st == 404: return "not_found"
     if st == 422: return "unprocessable_entity"
+    if st == 429: return "too_many_requests"
+    if st == 503: return "service_unavailable"
     if st >= 500: return "server_error"
     return "error"
 
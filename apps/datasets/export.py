@@ -0,0 +1,170 @@
+"""Filtered, projected and optionally sorted dataset exports produced batch by batch.
+
+Sorted exports are external merge sorts: sorted runs of ``SORT_RUN_ROWS`` rows
+are spilled to temporary Arrow files and merged ``MERGE_FAN_IN`` at a time (in
+several passes when there are more runs), so memory holds one run, or one
+block per merged run, whatever the size of the export.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from .loaders import BATCH_ROWS, dataset_schema, iter_filtered_batches
+from .services import ROW_POSITION, compile_filters, parse_sort, sort_order
+
+logger = logging.getLogger(__name__)
+
+SORT_RUN_ROWS = 256 * 1024
+MERGE_FAN_IN = 8
+MERGE_BLOCK_ROWS = SORT_RUN_ROWS // MERGE_FAN_IN
+
+
+def export_schema(datafile, columns: List[str] | None, sort_expr: str | None,
+                  filters: List[Tuple[str, str, str]] = ()) -> pa.Schema:
+    """Schema of the export; raises ValueError for unknown output or sort columns and invalid filters."""
+    schema = dataset_schema(datafile)
+    wanted = (columns or []) + [f for f, _ in parse_sort(sort_expr)]
+    missing = [c for c in wanted if c not in schema.names]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    # Literals are converted here (unknown ops, non-numeric bounds), not mid-stream.
+    compile_filters(schema, list(filters))
+    return pa.schema([schema.field(c) for c in columns]) if columns else schema
+
+
+def export_batches(datafile, columns: List[str] | None, filters: List[Tuple[str, str, str]],
+                   sort_expr: str | None = None) -> Iterator[pa.RecordBatch]:
+    """Matching rows, projected to ``columns``, in ``sort_expr`` order if given.
+
+    Nothing is yielded before the filters have been evaluated on every row, so
+    a value that fails to cast surfaces on the first ``next()``, before the
+    response starts. Failures after that are logged and re-raised.
+    """
+    keys = parse_sort(sort_expr)
+    if keys:
+        # The first pass of the sort reads every matching row.
+        batches = _sorted_batches(datafile, columns, filters, keys)
+    else:
+        if filters:
+            # Only the filter columns are read.
+            for _ in iter_filtered_batches(datafile, [], filters):
+                pass
+        batches = iter_filtered_batches(datafile, columns, filters)
+    started = False
+    try:
+        for batch in batches:
+            started = True
+            yield batch
+    except Exception as e:
+        if started:
+            logger.error(f"Export failed mid-stream - dataset_id: {datafile.id}, error: {e}")
+        raise
+
+
+def _sorted_batches(datafile, columns, filters, keys) -> Iterator[pa.RecordBatch]:
+    key_names = [f for f, _ in keys]
+    read = list(dict.fromkeys(columns + key_names)) if columns is not None else None
+    with tempfile.TemporaryDirectory(prefix="axi-export-") as tmp:
+        runs: List[str] = []
+        pending: List[pa.RecordBatch] = []
+        offset = rows = 0
+        for batch in iter_filtered_batches(datafile, read, filters):
+            if not batch.num_rows:
+                continue
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows >= SORT_RUN_ROWS:
+                runs.append(_write_run(tmp, len(runs), [_sorted_run(pending, offset, keys)]))
+                offset += rows
+                pending, rows = [], 0
+        last = _sorted_run(pending, offset, keys) if pending else None
+        if not runs:
+            if last is not None:
+                yield from _output(last, columns)
+            return
+        if last is not None:
+            runs.append(_write_run(tmp, len(runs), [last]))
+        del pending, last
+        names = len(runs)
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MERGE_FAN_IN):
+                group = runs[i:i + MERGE_FAN_IN]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                merged.append(_write_run(tmp, names, _merge(group, keys)))
+                names += 1
+                for path in group:
+                    os.remove(path)
+            runs = merged
+        for table in _merge(runs, keys):
+            yield from _output(table, columns)
+
+
+def _sorted_run(batches: List[pa.RecordBatch], offset: int, keys) -> pa.Table:
+    """``batches`` sorted by ``keys``, ties broken by their position in the export."""
+    table = pa.Table.from_batches(batches)
+    table = table.append_column(ROW_POSITION, pa.array(np.arange(offset, offset + table.num_rows, dtype=np.int64)))
+    return table.take(sort_order(table, keys))
+
+
+def _write_run(tmp: str, name: int, tables: Iterable[pa.Table]) -> str:
+    path = os.path.join(tmp, f"{name}.arrow")
+    writer = None
+    try:
+        for table in tables:
+            if writer is None:
+                writer = pa.ipc.new_file(path, table.schema)
+            writer.write_table(table, max_chunksize=MERGE_BLOCK_ROWS)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def _read_run(path: str) -> Iterator[pa.Table]:
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield pa.Table.from_batches([reader.get_batch(i)])
+
+
+def _merge(runs: List[str], keys) -> Iterator[pa.Table]:
+    """Merge sorted run files block by block.
+
+    Each round sorts the buffered blocks together and emits every row up to the
+    smallest of the runs' last buffered rows: no run can still hold a row
+    before it. The run that supplied that row is refilled with its next block.
+    """
+    sources = [_read_run(path) for path in runs]
+    buffers = [next(source, None) for source in sources]
+    while True:
+        live = [i for i, buffer in enumerate(buffers) if buffer is not None]
+        if not live:
+            return
+        table = pa.concat_tables([buffers[i] for i in live])
+        ends = np.cumsum([buffers[i].num_rows for i in live])
+        order = sort_order(table, keys).to_numpy()
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order), dtype=np.int64)
+        cut = int(rank[ends - 1].min()) + 1
+        yield table.take(order[:cut])
+        rest = np.sort(order[cut:])
+        bounds = np.searchsorted(rest, np.concatenate(([0], ends)))
+        for j, i in enumerate(live):
+            left = rest[bounds[j]:bounds[j + 1]]
+            buffers[i] = table.take(left) if len(left) else next(sources[i], None)
+
+
+def _output(table: pa.Table, columns: List[str] | None) -> Iterator[pa.RecordBatch]:
+    table = table.drop_columns([ROW_POSITION])
+    if columns is not None:
+        table = table.select(list(dict.fromkeys(columns)))
+    yield from table.to_batches(max_chunksize=BATCH_ROWS)
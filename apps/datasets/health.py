@@ -0,0 +1,195 @@
+"""Cached health probes for external integrations (Nexus, Echo, Aide).
+
+``/health/integrations`` never probes on the request path once results exist:
+each target's last result lives in the Django cache (shared by every worker
+with Redis) and is served as is, while a stale one triggers a probe in a
+background thread. A ``cache.add`` lock per target lets one probe per
+``DATASET_HEALTH_TTL`` seconds through, however often the endpoint is polled.
+Only targets with no usable result are waited for, all at once and for at most
+``DATASET_HEALTH_DEADLINE`` seconds. Nexus and Echo also report the webhook
+delivery counters of all workers (``webhooks.delivery_stats``).
+
+``/health/ready`` checks this instance's own dependencies: a ``SELECT 1`` and a
+lookup of a single storage object (a metadata GET on GCS, never a bucket
+listing). The result is kept in process for ``DATASET_HEALTH_READY_TTL``
+seconds and concurrent polls share one probe.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from .webhooks import delivery_stats
+
+INTEGRATIONS = {"nexus": "NEXUS_WEBHOOK_URL", "echo": "ECHO_URL", "aide": "AIDE_URL"}
+
+DEFAULT_TTL = 15.0
+DEFAULT_MAX_STALE = 300.0
+DEFAULT_DEADLINE = 1.0
+DEFAULT_PROBE_TIMEOUT = 2.0
+DEFAULT_READY_TTL = 5.0
+# Only its metadata is looked up: it does not need to exist.
+DEFAULT_STORAGE_PROBE = "health/probe"
+
+
+def check_integration(url: str | None, timeout: float = DEFAULT_PROBE_TIMEOUT) -> Dict[str, Any]:
+    if not url:
+        return {"status": "unknown"}
+    started = time.perf_counter()
+    try:
+        r = requests.get(url, timeout=timeout)
+        out = {"status": "ok" if r.status_code < 500 else "degraded", "code": r.status_code}
+    except Exception as e:
+        out = {"status": "error", "error": str(e)}
+    out["latency_ms"] = round(1000 * (time.perf_counter() - started), 1)
+    return out
+
+
+class IntegrationHealth:
+    """Stale-while-revalidate cache of integration probes."""
+
+    def __init__(self, ttl: float, max_stale: float, deadline: float, timeout: float):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.deadline = deadline
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._inflight: Dict[str, Future] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=len(INTEGRATIONS), thread_name_prefix="health")
+                self._inflight = {}
+                self._pid = os.getpid()
+            return self._executor
+
+    def _probe(self, name: str, url: str) -> Dict[str, Any]:
+        entry = {"url": url, "checked_at": time.time(), "result": check_integration(url, self.timeout)}
+        cache.set(f"datasets:health:{name}", entry, self.max_stale)
+        return entry
+
+    def _refresh(self, name: str, url: str) -> Future | None:
+        """Probe ``name`` in the background unless it was already probed this interval; the probe in flight."""
+        executor = self._get_executor()
+        with self._lock:
+            future = self._inflight.get(name)
+            if future is not None and not future.done():
+                return future
+            # Held for at least a probe timeout, so a slow target is never probed twice at once.
+            if not cache.add(f"datasets:health:{name}:probe", 1, max(self.ttl, self.timeout)):
+                return None
+            future = self._inflight[name] = executor.submit(self._probe, name, url)
+            return future
+
+    def check(self) -> Dict[str, Dict[str, Any]]:
+        urls = {name: getattr(settings, setting, None) for name, setting in INTEGRATIONS.items()}
+        cached = cache.get_many([f"datasets:health:{name}" for name in urls])
+        now = time.time()
+        out: Dict[str, Dict[str, Any]] = {}
+        waiting: Dict[str, Future] = {}
+        for name, url in urls.items():
+            if not url:
+                out[name] = check_integration(None)
+                continue
+            entry = cached.get(f"datasets:health:{name}")
+            if entry is not None and entry["url"] != url:
+                entry = None
+            if entry is None or now - entry["checked_at"] >= self.ttl:
+                future = self._refresh(name, url)
+                if entry is None and future is not None:
+                    waiting[name] = future
+            if entry is not None:
+                out[name] = self._payload(entry, now)
+        if waiting:
+            wait(waiting.values(), timeout=self.deadline)
+        for name in urls:
+            if name in out:
+                continue
+            future = waiting.get(name)
+            if future is not None and future.done():
+                out[name] = self._payload(future.result(), time.time())
+            else:
+                # First check still running here or in another worker: its result serves the next poll.
+                out[name] = {"status": "unknown", "error": "check pending"}
+        for name, counters in delivery_stats().items():
+            out[name]["deliveries"] = counters
+        return out
+
+    @staticmethod
+    def _payload(entry: Dict[str, Any], now: float) -> Dict[str, Any]:
+        return {**entry["result"], "age_s": round(max(now - entry["checked_at"], 0.0), 1)}
+
+
+integration_health = IntegrationHealth(
+    ttl=getattr(settings, "DATASET_HEALTH_TTL", DEFAULT_TTL),
+    max_stale=getattr(settings, "DATASET_HEALTH_MAX_STALE", DEFAULT_MAX_STALE),
+    deadline=getattr(settings, "DATASET_HEALTH_DEADLINE", DEFAULT_DEADLINE),
+    timeout=getattr(settings, "DATASET_HEALTH_PROBE_TIMEOUT", DEFAULT_PROBE_TIMEOUT),
+)
+
+
+def _timed_probe(fn) -> tuple[str, float]:
+    started = time.perf_counter()
+    try:
+        fn()
+        status = "ok"
+    except Exception as e:
+        status = f"error: {str(e)}"
+    return status, round(1000 * (time.perf_counter() - started), 1)
+
+
+def _probe_database() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def _probe_storage(name: str) -> None:
+    # A missing object is fine; unreachable storage or bad credentials raise.
+    default_storage.exists(name)
+
+
+class Readiness:
+    """Database and storage probes for this instance, cached for ``ttl`` seconds."""
+
+    def __init__(self, ttl: float, storage_probe: str):
+        self.ttl = ttl
+        self.storage_probe = storage_probe
+        self._lock = threading.Lock()
+        self._result: Dict[str, Any] | None = None
+        self._checked_at = 0.0
+
+    def _run(self) -> Dict[str, Any]:
+        db_status, db_ms = _timed_probe(_probe_database)
+        storage_status, storage_ms = _timed_probe(lambda: _probe_storage(self.storage_probe))
+        return {
+            "status": "ok" if db_status == "ok" and storage_status == "ok" else "degraded",
+            "database": db_status,
+            "storage": storage_status,
+            "latency_ms": {"database": db_ms, "storage": storage_ms},
+        }
+
+    def check(self) -> Dict[str, Any]:
+        # Polls arriving during a probe wait for it instead of starting their own.
+        with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= self.ttl:
+                self._result = self._run()
+                self._checked_at = time.monotonic()
+            return {**self._result, "age_s": round(time.monotonic() - self._checked_at, 1)}
+
+
+readiness = Readiness(
+    ttl=getattr(settings, "DATASET_HEALTH_READY_TTL", DEFAULT_READY_TTL),
+    storage_probe=getattr(settings, "DATASET_HEALTH_STORAGE_PROBE", DEFAULT_STORAGE_PROBE),
+)
@@ -0,0 +1,189 @@
+"""Persisted per-column secondary indexes for /rows filters.
+
+An index is a Parquet file of ``(value, row_id)`` pairs sorted by value and
+written in small row groups. Equal values form one contiguous run (the
+dictionary postings for that value) and ranges are contiguous slices, so a
+lookup is a filtered read whose row-group statistics skip every group that
+cannot match: only the groups holding the requested values are decoded.
+
+Free-text columns can also get a trigram index for ``contains``: one
+``(gram, row_id)`` posting per distinct trigram of each value, sorted by gram.
+A literal needle matches only rows holding all of its trigrams.
+"""
+from __future__ import annotations
+
+import logging
+import operator
+import os
+import tempfile
+from typing import List, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+from .columnar import parquet_source
+from .models import ColumnIndex
+from .services import typed_literal
+
+logger = logging.getLogger(__name__)
+
+INDEX_ROW_GROUP_ROWS = 64 * 1024
+# Values longer than this are not split into trigrams; they are always candidates.
+TRIGRAM_MAX_CHARS = 128
+RANGE_OPS = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def index_name(datafile, column: str, kind: str) -> str:
+    base = os.path.splitext(datafile.file.name)[0]
+    return f"{base}.{kind}.{get_valid_filename(column)}.parquet"
+
+
+def _save(datafile, column: str, kind: str, table: pa.Table) -> ColumnIndex:
+    with tempfile.NamedTemporaryFile(suffix=".parquet") as tmp:
+        pq.write_table(table, tmp.name, row_group_size=INDEX_ROW_GROUP_ROWS)
+        tmp.seek(0)
+        name = default_storage.save(index_name(datafile, column, kind), File(tmp))
+    index, _ = ColumnIndex.objects.update_or_create(
+        datafile=datafile, column=column, kind=kind, defaults={"file": name},
+    )
+    return index
+
+
+def sorted_index_table(values: pa.ChunkedArray) -> pa.Table:
+    row_ids = pa.array(np.arange(len(values), dtype=np.int64))
+    table = pa.table({"value": values, "row_id": row_ids}).filter(pc.is_valid(values))
+    return table.take(pc.sort_indices(table, sort_keys=[("value", "ascending"), ("row_id", "ascending")]))
+
+
+def trigrams(values: pa.Array | pa.ChunkedArray) -> pa.Table:
+    """``(gram, row_id)`` for every trigram of every value, duplicates included."""
+    lengths = pc.fill_null(pc.utf8_length(values), 0).to_numpy(zero_copy_only=False)
+    parts = []
+    for start in range(int(min(lengths.max(initial=0), TRIGRAM_MAX_CHARS)) - 2):
+        rows = np.flatnonzero(lengths >= start + 3)
+        grams = pc.utf8_slice_codeunits(pc.take(values, rows), start, start + 3)
+        parts.append(pa.table({"gram": grams, "row_id": pa.array(rows, pa.int64())}))
+    if not parts:
+        return pa.table({"gram": pa.array([], pa.string()), "row_id": pa.array([], pa.int64())})
+    return pa.concat_tables(parts)
+
+
+def trigram_index_table(values: pa.ChunkedArray) -> pa.Table:
+    """Distinct postings sorted by gram; over-long values are stored with a null gram."""
+    values = pc.cast(values, pa.string())
+    table = trigrams(values).group_by(["gram", "row_id"]).aggregate([])
+    lengths = pc.utf8_length(values).to_numpy(zero_copy_only=False)
+    long_rows = np.flatnonzero(np.nan_to_num(lengths.astype(np.float64)) > TRIGRAM_MAX_CHARS)
+    long = pa.table({"gram": pa.nulls(len(long_rows), pa.string()), "row_id": pa.array(long_rows, pa.int64())})
+    table = pa.concat_tables([table.select(["gram", "row_id"]), long])
+    return table.take(pc.sort_indices(table, sort_keys=[("gram", "ascending"), ("row_id", "ascending")]))
+
+
+def _configured(name: str, schema: pa.Schema, string_only: bool = False) -> List[str]:
+    columns = [c for c in getattr(settings, name, []) if c in schema.names]
+    if string_only:
+        columns = [c for c in columns if pa.types.is_string(schema.field(c).type) or pa.types.is_large_string(schema.field(c).type)]
+    return columns
+
+
+def build_column_indexes(datafile) -> List[ColumnIndex]:
+    """Build the sorted and trigram indexes configured for columns of ``datafile``."""
+    if not datafile.columnar_file:
+        return []
+    with datafile.columnar_file.open("rb") as f:
+        pf = pq.ParquetFile(f)
+        sorted_cols = _configured("DATASET_INDEX_COLUMNS", pf.schema_arrow)
+        trigram_cols = _configured("DATASET_TRIGRAM_COLUMNS", pf.schema_arrow, string_only=True)
+        columns = list(dict.fromkeys(sorted_cols + trigram_cols))
+        table = pf.read(columns=columns) if columns else None
+    built = []
+    for column in sorted_cols:
+        built.append(_save(datafile, column, ColumnIndex.SORTED, sorted_index_table(table.column(column))))
+    for column in trigram_cols:
+        built.append(_save(datafile, column, ColumnIndex.TRIGRAM, trigram_index_table(table.column(column))))
+    return built
+
+
+def _lookup_expression(dtype: pa.DataType, op: str, value: str) -> pc.Expression | None:
+    field = pc.field("value")
+    if op == "eq":
+        literal = typed_literal(dtype, value)
+        return pc.scalar(False) if literal is None else field == literal
+    if op == "in":
+        expr = pc.scalar(False)
+        for item in value.split("|"):
+            literal = typed_literal(dtype, item)
+            if literal is not None:
+                expr = expr | (field == literal)
+        return expr
+    if op in RANGE_OPS and (pa.types.is_integer(dtype) or pa.types.is_floating(dtype)):
+        return RANGE_OPS[op](field, pc.scalar(float(value)))
+    return None
+
+
+def _read_index(index: ColumnIndex, op: str, value: str) -> pa.Array | None:
+    with parquet_source(index.file) as source:
+        fragment = ds.ParquetFileFormat().make_fragment(source)
+        expr = _lookup_expression(fragment.physical_schema.field("value").type, op, value)
+        if expr is None:
+            return None
+        return fragment.to_table(columns=["row_id"], filter=expr).column("row_id").combine_chunks()
+
+
+def _read_trigrams(index: ColumnIndex, value: str) -> pa.Array | None:
+    needle = pa.array([value], pa.string())
+    grams = pc.unique(trigrams(needle).column("gram"))
+    if not len(grams):
+        # Shorter than a trigram: the index cannot narrow anything.
+        return None
+    gram = pc.field("gram")
+    # OR-ed equalities rather than isin(): only they prune row groups by statistics.
+    expr = gram.is_null()
+    for g in grams:
+        expr = expr | (gram == g)
+    with parquet_source(index.file) as source:
+        fragment = ds.ParquetFileFormat().make_fragment(source)
+        postings = fragment.to_table(filter=expr)
+    long = pc.is_null(postings.column("gram"))
+    hits = postings.filter(pc.invert(long)).group_by("row_id").aggregate([("gram", "count")])
+    rows = hits.filter(pc.equal(hits.column("gram_count"), len(grams))).column("row_id")
+    return pa.chunked_array([rows, postings.filter(long).column("row_id")], pa.int64()).combine_chunks()
+
+
+def candidate_rows(datafile, filters: List[Tuple[str, str, str]]) -> pa.Array | None:
+    """Sorted row ids that may satisfy ``filters``, or None if no index applies.
+
+    The result is a superset of the matches (every indexed filter is applied,
+    the others are not), so callers still evaluate the full filter on it.
+    Equality and ``contains`` lookups run first; range lookups are skipped once
+    they have narrowed the candidates, since verifying a few rows is cheaper.
+    """
+    indexed = {(i.column, i.kind): i for i in datafile.indexes.all()}
+    rows = None
+    for col, op, val in sorted(filters, key=lambda f: f[1] in RANGE_OPS):
+        kind = ColumnIndex.TRIGRAM if op == "contains" else ColumnIndex.SORTED
+        index = indexed.get((col, kind))
+        if index is None or (rows is not None and op in RANGE_OPS):
+            continue
+        try:
+            if kind == ColumnIndex.TRIGRAM:
+                found = _read_trigrams(index, val)
+            else:
+                found = _read_index(index, op, val)
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Index lookup failed - dataset_id: {datafile.id}, column: {col}, error: {e}")
+            continue
+        if found is None:
+            continue
+        found = pc.unique(found)
+        rows = found if rows is None else rows.filter(pc.is_in(rows, value_set=found))
+    if rows is None:
+        return None
+    return pc.take(rows, pc.sort_indices(rows))
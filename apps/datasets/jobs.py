@@ -0,0 +1,189 @@
+"""Asynchronous analytics jobs executed by Celery workers.
+
+A job is identified by a hash of the dataset version (id, size, upload time),
+the job type and its normalized parameters, so identical requests map to the
+same Celery task id. Submitting a job that already succeeded returns the
+stored result at once; one that is queued or running is not enqueued again.
+Results, the job's dataset and parameters all live in the Celery result
+backend (Redis in deployments), so any web worker can answer a status poll.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict
+
+from celery import shared_task
+from celery.backends.redis import RedisBackend
+from celery.result import AsyncResult
+from django.core.cache import cache
+from rest_framework import serializers
+
+from .compute import cohort_result, correlation_result, summary_result, trend_result
+from .models import DataFile, DatasetStats
+from .serializers import CohortParamsSerializer, TrendParamsSerializer
+from .services import DataReadError, trend_payload
+
+logger = logging.getLogger(__name__)
+
+# Guards the check-then-enqueue step against concurrent identical submissions.
+SUBMIT_LOCK_SECONDS = 30
+QUEUED = "QUEUED"
+STATUSES = {
+    QUEUED: "queued",
+    "RETRY": "queued",
+    "STARTED": "running",
+    "SUCCESS": "succeeded",
+    "FAILURE": "failed",
+    "REVOKED": "failed",
+}
+
+
+def _meta_key(job_id: str) -> str:
+    return f"axi-job-meta-{job_id}"
+
+
+def _load_meta(job_id: str) -> Dict[str, Any] | None:
+    backend = run_dataset_job.backend
+    payload = backend.get(_meta_key(job_id))
+    return None if payload is None else backend.decode(payload)
+
+
+def _store_meta(job_id: str, meta: Dict[str, Any]) -> None:
+    # Key-value result backends expire it with the results (result_expires).
+    backend = run_dataset_job.backend
+    backend.set(_meta_key(job_id), backend.encode(meta))
+
+
+def _acquire_submit_lock(job_id: str) -> bool:
+    backend = run_dataset_job.backend
+    if isinstance(backend, RedisBackend):
+        return bool(backend.client.set(f"axi-job-submit-{job_id}", 1, nx=True, ex=SUBMIT_LOCK_SECONDS))
+    # Other backends have no atomic add: fall back to the Django cache.
+    return cache.add(f"axi-job-submit-{job_id}", 1, SUBMIT_LOCK_SECONDS)
+
+
+def _release_submit_lock(job_id: str) -> None:
+    backend = run_dataset_job.backend
+    if isinstance(backend, RedisBackend):
+        backend.client.delete(f"axi-job-submit-{job_id}")
+    else:
+        cache.delete(f"axi-job-submit-{job_id}")
+
+
+def _columns(value) -> list | None:
+    if not value:
+        return None
+    items = value.split(",") if isinstance(value, str) else value
+    if not isinstance(items, list) or not all(isinstance(c, str) for c in items):
+        raise serializers.ValidationError({"cols": ["Expected a list or comma-separated string of column names."]})
+    return sorted({c.strip() for c in items if c.strip()}) or None
+
+
+def normalize_params(job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical parameters for ``job_type``: validated, defaults filled in, irrelevant keys dropped."""
+    if job_type == "correlation":
+        return {"cols": _columns(params.get("cols"))}
+    if job_type == "trend":
+        trend = TrendParamsSerializer(data=params)
+        trend.is_valid(raise_exception=True)
+        out = dict(trend.validated_data)
+        if out["agg"] == ["count"]:
+            out.pop("value", None)
+        elif not out.get("value"):
+            raise serializers.ValidationError({"value": ["Required for agg != count."]})
+        return out
+    if job_type == "cohort":
+        cohort = CohortParamsSerializer(data=params)
+        cohort.is_valid(raise_exception=True)
+        return dict(cohort.validated_data)
+    return {}
+
+
+def job_id_for(datafile, job_type: str, params: Dict[str, Any]) -> str:
+    key = json.dumps({
+        "dataset": [datafile.id, datafile.file_size, datafile.created_at.isoformat()],
+        "type": job_type,
+        "params": params,
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _run(datafile, job_type: str, params: Dict[str, Any]):
+    if job_type == "summary":
+        result = summary_result(datafile)
+        # Also serves the synchronous /summary endpoint from now on.
+        DatasetStats.store(datafile, result)
+        return result
+    if job_type == "correlation":
+        return correlation_result(datafile, params["cols"])
+    if job_type == "trend":
+        value_cols = params.get("value") or []
+        return trend_payload(trend_result(datafile, params["date"], value_cols, params["freq"], params["agg"]),
+                             value_cols, params["agg"])
+    return cohort_result(datafile, params["freq"])
+
+
+@shared_task(bind=True, track_started=True)
+def run_dataset_job(self, dataset_id: int, job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one analytics job; invalid columns or unreadable files are reported in ``error``."""
+    datafile = DataFile.objects.filter(pk=dataset_id).first()
+    if datafile is None:
+        return {"error": "Dataset not found"}
+    try:
+        return {"result": _run(datafile, job_type, params)}
+    except (ValueError, DataReadError) as e:
+        return {"error": str(e)}
+
+
+def job_status(job_id: str) -> Dict[str, Any] | None:
+    """Status payload for ``job_id``, or None if the job is unknown or expired."""
+    meta = _load_meta(job_id)
+    if meta is None:
+        return None
+    result = AsyncResult(job_id, app=run_dataset_job.app)
+    state = result.state
+    if state == "PENDING":
+        # Submission records QUEUED first, so the backend has no record: the result expired.
+        return None
+    out = {"job_id": job_id, **meta, "status": STATUSES.get(state, "running")}
+    if state == "SUCCESS":
+        payload = result.result or {}
+        if payload.get("error"):
+            out["status"] = "failed"
+            out["error"] = payload["error"]
+        else:
+            out["result"] = payload.get("result")
+    elif state in ("FAILURE", "REVOKED"):
+        out["error"] = "Job failed"
+    return out
+
+
+def submit_job(datafile, job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Enqueue the job unless an identical one is queued, running or already done."""
+    job_id = job_id_for(datafile, job_type, params)
+    status = job_status(job_id)
+    if status is not None and status["status"] != "failed":
+        return {**status, "cached": status["status"] == "succeeded"}
+    meta = {"dataset_id": datafile.id, "type": job_type, "params": params}
+    if not _acquire_submit_lock(job_id):
+        return {"job_id": job_id, **meta, "status": "queued", "cached": False}
+    try:
+        _store_meta(job_id, meta)
+        result = AsyncResult(job_id, app=run_dataset_job.app)
+        result.forget()
+        # Recorded before enqueueing: a fast worker's STARTED must not be overwritten by QUEUED.
+        result.backend.store_result(job_id, None, QUEUED)
+        try:
+            run_dataset_job.apply_async((datafile.id, job_type, params), task_id=job_id)
+        except Exception:
+            # Otherwise the job id would stay "queued" and identical submissions never run it.
+            result.forget()
+            result.backend.delete(_meta_key(job_id))
+            raise
+    finally:
+        _release_submit_lock(job_id)
+    logger.info(f"Analytics job submitted - job_id: {job_id}, dataset_id: {datafile.id}, type: {job_type}")
+    status = job_status(job_id) or {"job_id": job_id, **meta, "status": "queued"}
+    return {**status, "cached": False}
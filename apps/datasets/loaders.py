@@ -0,0 +1,307 @@
+"""Dataset loading shared by every analytics view.
+
+Reads the Parquet sidecar when the upload task has produced one (only the
+requested columns are decoded) and falls back to parsing the raw CSV otherwise.
+"""
+from __future__ import annotations
+
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .cache import cache_key, table_cache
+from .columnar import local_path as _local_path, open_csv_stream, parquet_source as _parquet_source
+from .indexes import candidate_rows
+from .services import DataReadError, compile_filters
+
+BATCH_ROWS = 64 * 1024
+COUNT_CHUNK_BYTES = 16 << 20
+_NL, _CR, _QUOTE = ord("\n"), ord("\r"), ord('"')
+# Bytes other than the whitespace pandas ignores on blank lines.
+_SOLID = np.ones(256, dtype=bool)
+_SOLID[[ord(" "), ord("\t"), _CR, _NL]] = False
+DEFAULT_STREAMING_THRESHOLD_BYTES = 256 << 20
+
+
+def _read_parquet(fieldfile, columns: List[str] | None) -> pa.Table:
+    path = _local_path(fieldfile)
+    if path:
+        schema = pq.read_schema(path, memory_map=True)
+        cols = [c for c in columns if c in schema.names] if columns is not None else None
+        return pq.read_table(path, columns=cols, memory_map=True)
+    with fieldfile.open("rb") as f:
+        pf = pq.ParquetFile(f)
+        cols = [c for c in columns if c in pf.schema_arrow.names] if columns is not None else None
+        return pf.read(columns=cols)
+
+
+def _read_csv(fieldfile, columns: List[str] | None) -> pd.DataFrame:
+    usecols = (lambda c: c in columns) if columns is not None else None
+    try:
+        with fieldfile.open("r") as f:
+            return pd.read_csv(f, usecols=usecols, dtype_backend="pyarrow")
+    except pd.errors.EmptyDataError:
+        raise DataReadError("Empty file")
+    except pd.errors.ParserError:
+        raise DataReadError("Invalid CSV format")
+
+
+def _read_table(datafile, columns: List[str] | None) -> pa.Table:
+    if datafile.columnar_file:
+        return _read_parquet(datafile.columnar_file, columns)
+    return pa.Table.from_pandas(_read_csv(datafile.file, columns), preserve_index=False)
+
+
+def load_table(datafile, columns: List[str] | None = None) -> pa.Table:
+    """Load ``datafile`` as an Arrow table, projecting to ``columns`` when given.
+
+    Results are served from the per-worker table cache when possible. Unknown
+    column names are ignored here so callers keep validating them with their
+    own error messages.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+    return table_cache.get_or_load(cache_key(datafile), columns, lambda cols: _read_table(datafile, cols))
+
+
+def load_dataframe(datafile, columns: List[str] | None = None) -> pd.DataFrame:
+    return load_table(datafile, columns).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def take_rows(datafile, rows: pa.Array, columns: List[str] | None = None) -> pa.Table:
+    """Read sorted row ids from the sidecar, decoding only the row groups holding them."""
+    with _parquet_source(datafile.columnar_file) as source:
+        pf = pq.ParquetFile(source)
+        cols = [c for c in columns if c in pf.schema_arrow.names] if columns is not None else None
+        sizes = np.array([pf.metadata.row_group(i).num_rows for i in range(pf.num_row_groups)], dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(sizes)])
+        ids = rows.to_numpy(zero_copy_only=False).astype(np.int64)
+        groups = np.searchsorted(starts, ids, side="right") - 1
+        selected = np.unique(groups)
+        if not len(selected):
+            return pf.schema_arrow.empty_table().select(cols) if cols is not None else pf.schema_arrow.empty_table()
+        table = pf.read_row_groups(selected.tolist(), columns=cols)
+    # Offset of each selected group inside the concatenated table.
+    base = np.concatenate([[0], np.cumsum(sizes[selected])])[:-1]
+    local = ids - starts[groups] + base[np.searchsorted(selected, groups)]
+    return table.take(pa.array(local))
+
+
+def scan_table(datafile, columns: List[str] | None,
+               filters: List[Tuple[str, str, str]]) -> pa.Table:
+    """Load only the rows matching ``filters`` and only ``columns``.
+
+    The filters are compiled into a single Arrow expression evaluated while
+    scanning, so row groups whose statistics rule them out are skipped and
+    non-matching rows are never materialized. Cached columns are filtered in
+    place; filtered scans do not populate the cache.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+    if not filters:
+        return load_table(datafile, columns)
+    cached = table_cache.lookup(cache_key(datafile), columns)
+    if cached is not None:
+        expr = compile_filters(cached.schema, filters)
+        return cached if expr is None else cached.filter(expr)
+    if datafile.columnar_file:
+        rows = candidate_rows(datafile, filters)
+        if rows is not None:
+            table = take_rows(datafile, rows, columns)
+            expr = compile_filters(table.schema, filters)
+            return table if expr is None else table.filter(expr)
+        with _parquet_source(datafile.columnar_file) as source:
+            fragment = ds.ParquetFileFormat().make_fragment(source)
+            schema = fragment.physical_schema
+            cols = [c for c in columns if c in schema.names] if columns is not None else None
+            return fragment.to_table(columns=cols, filter=compile_filters(schema, filters))
+    with datafile.file.open("rb") as f:
+        reader = open_csv_stream(f, columns)
+        expr = compile_filters(reader.schema, filters)
+        parts = []
+        for batch in reader:
+            part = pa.Table.from_batches([batch])
+            parts.append(part if expr is None else part.filter(expr))
+        return pa.concat_tables(parts) if parts else reader.schema.empty_table()
+
+
+def iter_filtered_batches(datafile, columns: List[str] | None,
+                          filters: List[Tuple[str, str, str]]) -> Iterator[pa.RecordBatch]:
+    """Yield the rows matching ``filters``, projected to ``columns``, batch by batch.
+
+    Batches come out in file order on every call, so two scans with the same
+    filters line up row for row.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+    needed = list(dict.fromkeys(columns + [col for col, _, _ in filters])) if columns is not None else None
+    if datafile.columnar_file:
+        # One row group decoded at a time; the dataset scanner reads ahead whole files.
+        with _parquet_source(datafile.columnar_file) as source:
+            pf = pq.ParquetFile(source)
+            expr = compile_filters(pf.schema_arrow, filters)
+            cols = [c for c in columns if c in pf.schema_arrow.names] if columns is not None else None
+            read = [c for c in needed if c in pf.schema_arrow.names] if needed is not None else None
+            for batch in pf.iter_batches(batch_size=BATCH_ROWS, columns=read):
+                yield from _filter_batch(batch, expr, cols)
+        return
+    with datafile.file.open("rb") as f:
+        reader = open_csv_stream(f, needed)
+        expr = compile_filters(reader.schema, filters)
+        cols = [c for c in columns if c in reader.schema.names] if columns is not None else None
+        for batch in reader:
+            yield from _filter_batch(batch, expr, cols)
+
+
+def _filter_batch(batch: pa.RecordBatch, expr, cols: List[str] | None) -> Iterator[pa.RecordBatch]:
+    part = pa.Table.from_batches([batch])
+    if expr is not None:
+        part = part.filter(expr)
+    if cols is not None:
+        part = part.select(cols)
+    yield from part.to_batches()
+
+
+def cached_head(datafile, nrows: int) -> pd.DataFrame | None:
+    """First ``nrows`` rows if the full table is already cached, without loading it."""
+    table = table_cache.peek(cache_key(datafile))
+    if table is None:
+        return None
+    return table.slice(0, nrows).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def dataset_columns(datafile) -> List[str]:
+    """Column names, read from the Parquet footer or the CSV header only."""
+    if datafile.columnar_file:
+        path = _local_path(datafile.columnar_file)
+        if path:
+            return pq.read_schema(path, memory_map=True).names
+        with datafile.columnar_file.open("rb") as f:
+            return pq.read_schema(f).names
+    with datafile.file.open("r") as f:
+        return list(map(str, pd.read_csv(f, nrows=0).columns.tolist()))
+
+
+def dataset_shape(datafile) -> tuple[int, List[str]]:
+    """Row count and column names; O(1) from Parquet metadata, else a byte scan of the CSV."""
+    if datafile.columnar_file:
+        path = _local_path(datafile.columnar_file)
+        if path:
+            meta = pq.read_metadata(path, memory_map=True)
+        else:
+            with datafile.columnar_file.open("rb") as f:
+                meta = pq.read_metadata(f)
+        return meta.num_rows, meta.schema.to_arrow_schema().names
+    row_count = count_csv_records(datafile.file)
+    return row_count, dataset_columns(datafile)
+
+
+def count_csv_records(fieldfile) -> int:
+    """Data rows in a CSV without parsing it, as ``len(pd.read_csv(...))`` counts them.
+
+    Line ends are found with vectorized byte comparisons; a running quote
+    parity excludes newlines inside quoted fields. The header and lines holding
+    only whitespace are not counted. Files with bare ``\\r`` line ends go
+    through the parser instead.
+    """
+    lines = blanks = 0
+    in_quotes = 0
+    # Whether the line in progress has anything but whitespace; leading blank lines count as blank.
+    content = False
+    last = -1
+    with fieldfile.open("rb") as f:
+        while chunk := f.read(COUNT_CHUNK_BYTES):
+            body = np.frombuffer(chunk, dtype=np.uint8)
+            if (last == _CR and body[0] != _NL) or (b"\r" in chunk and _bare_cr(body)):
+                return _parse_csv_records(fieldfile)
+            idx = np.flatnonzero(body == _NL)
+            quotes = np.flatnonzero(body == _QUOTE)
+            if in_quotes or len(quotes):
+                # Quotes before each newline decide whether it ends a record.
+                idx = idx[((np.searchsorted(quotes, idx) + in_quotes) & 1) == 0]
+                in_quotes = (len(quotes) + in_quotes) & 1
+            if len(idx):
+                lines += len(idx)
+                blanks += _blank_lines(body, idx, content)
+                content = bool(_SOLID[body[idx[-1] + 1:]].any())
+            else:
+                content = content or bool(_SOLID[body].any())
+            last = int(body[-1])
+    if last == -1:
+        raise DataReadError("Empty file")
+    if content:
+        # Unterminated last line.
+        lines += 1
+    return max(lines - blanks - 1, 0)
+
+
+def _bare_cr(body: np.ndarray) -> bool:
+    after = np.flatnonzero(body[:-1] == _CR) + 1
+    return bool(np.any(body[after] != _NL))
+
+
+def _blank_lines(body: np.ndarray, ends: np.ndarray, content: bool) -> int:
+    """Lines ending at ``ends`` with nothing but whitespace; ``content`` is the first line's part in earlier chunks."""
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Only lines whose last byte before the line end is whitespace can be blank.
+    last = ends - 1 - ((ends > 0) & (body[ends - 1] == _CR))
+    suspects = np.flatnonzero((last < starts) | ~_SOLID[body[np.maximum(last, 0)]])
+    if not len(suspects):
+        return 0
+    # Pairs of bounds: every other reduceat result covers one suspect line; an empty line yields its newline.
+    bounds = np.column_stack((starts[suspects], ends[suspects])).ravel()
+    filled = np.logical_or.reduceat(_SOLID[body[:ends[-1] + 1]], bounds)[::2]
+    if content and suspects[0] == 0:
+        filled[0] = True
+    return len(suspects) - int(np.count_nonzero(filled))
+
+
+def _parse_csv_records(fieldfile) -> int:
+    try:
+        # Not chunked: pandas miscounts chunks of \r-terminated lines.
+        with fieldfile.open("rb") as f:
+            return len(pd.read_csv(f, usecols=[0]))
+    except pd.errors.EmptyDataError:
+        return 0
+    except pd.errors.ParserError:
+        raise DataReadError("Invalid CSV format")
+
+
+def dataset_schema(datafile) -> pa.Schema:
+    """Arrow schema from the Parquet footer, or inferred from the first CSV block."""
+    if datafile.columnar_file:
+        path = _local_path(datafile.columnar_file)
+        if path:
+            return pq.read_schema(path, memory_map=True)
+        with datafile.columnar_file.open("rb") as f:
+            return pq.read_schema(f)
+    with datafile.file.open("rb") as f:
+        return open_csv_stream(f).schema
+
+
+def iter_batches(datafile, columns: List[str] | None = None) -> Iterator[pa.RecordBatch]:
+    """Yield record batches without ever holding the whole dataset in memory."""
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+    if datafile.columnar_file:
+        path = _local_path(datafile.columnar_file)
+        with (open(path, "rb") if path else datafile.columnar_file.open("rb")) as f:
+            pf = pq.ParquetFile(f)
+            cols = [c for c in columns if c in pf.schema_arrow.names] if columns is not None else None
+            yield from pf.iter_batches(batch_size=BATCH_ROWS, columns=cols)
+        return
+    with datafile.file.open("rb") as f:
+        yield from open_csv_stream(f, columns)
+
+
+def use_streaming(datafile) -> bool:
+    """Whether ``datafile`` is large enough to be processed batch by batch."""
+    threshold = getattr(settings, "DATASET_STREAMING_THRESHOLD_BYTES", DEFAULT_STREAMING_THRESHOLD_BYTES)
+    if table_cache.peek(cache_key(datafile)) is not None:
+        return False
+    return (datafile.file_size or 0) > threshold
@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from apps.datasets.renderers import FastJSONRenderer, records_json
+from apps.datasets.services import page_payload
+
+
+class Command(BaseCommand):
+    help = 'Benchmark /rows JSON rendering: stdlib records vs columnar fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        n = options['rows']
+        rng = np.random.default_rng(0)
+        table = pa.table({
+            'id': np.arange(n),
+            'amount': rng.normal(100, 25, n).round(2),
+            'ratio': rng.random(n),
+            'name': rng.choice(['alpha', 'beta', 'gamma', 'delta "quoted"'], n),
+            'date': pd.date_range('2024-01-01', periods=n, freq='h').strftime('%Y-%m-%d').tolist(),
+            'qty': pa.array([None if i % 7 == 0 else int(i) for i in range(n)], pa.int64()),
+        })
+        meta = {'page': 1, 'page_size': n, 'total': n, 'next_cursor': None}
+
+        def baseline():
+            return JSONRenderer().render(page_payload(meta, table.to_pylist()))
+
+        def fast():
+            return FastJSONRenderer().render(page_payload(meta, records_json(table)))
+
+        results = {}
+        for name, fn in (('stdlib (to_pylist + json)', baseline), ('fast (records_json + orjson)', fast)):
+            fn()
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                body = fn()
+            results[name] = (time.perf_counter() - start) / options['repeat']
+            self.stdout.write(f"{name:32s} {results[name] * 1000:8.2f} ms  {len(body):,} bytes")
+
+        base, quick = results.values()
+        self.stdout.write(self.style.SUCCESS(f"Speedup on {n:,} rows: {base / quick:.1f}x"))
@@ -0,0 +1,29 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.datasets.outbox import outbox_stats, relay_events
+from apps.datasets.tasks import dispatch_event
+from apps.datasets.webhooks import delivery_stats
+
+
+class Command(BaseCommand):
+    help = 'Relay pending outbox events: enqueue their processing and publish them to Echo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stats', action='store_true', help='Only print the backlog, lag and webhook delivery counters')
+        parser.add_argument('--loop', action='store_true', help='Keep relaying, like the beat schedule')
+        parser.add_argument('--interval', type=float, default=settings.DATASET_OUTBOX_RELAY_INTERVAL)
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps({**outbox_stats(), "deliveries": delivery_stats()}))
+            return
+        while True:
+            self.stdout.write(json.dumps(relay_events(handler=dispatch_event, max_batches=options['max_batches'])))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
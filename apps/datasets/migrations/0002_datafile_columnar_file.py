@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datafile',
+            name='columnar_file',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0002_datafile_columnar_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_count', models.BigIntegerField()),
+                ('schema', models.JSONField(default=list)),
+                ('columns', models.JSONField(default=dict)),
+                ('file_size', models.BigIntegerField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('datafile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='datasets.datafile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0003_datasetstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColumnIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('column', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('sorted', 'Sorted value/row-id')], default='sorted', max_length=16)),
+                ('file', models.FileField(max_length=512, upload_to='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('datafile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indexes', to='datasets.datafile')),
+            ],
+            options={
+                'unique_together': {('datafile', 'column', 'kind')},
+            },
+        ),
+    ]
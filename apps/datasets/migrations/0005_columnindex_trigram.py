@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0004_columnindex'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='columnindex',
+            name='kind',
+            field=models.CharField(choices=[('sorted', 'Sorted value/row-id'), ('trigram', 'Trigram postings')], default='sorted', max_length=16),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0005_columnindex_trigram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_column', models.CharField(max_length=255)),
+                ('data', models.JSONField(default=dict)),
+                ('file_size', models.BigIntegerField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('datafile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='datasets.datafile')),
+            ],
+            options={
+                'unique_together': {('datafile', 'date_column')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datasets', '0006_trendrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datafile',
+            name='column_names',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='row_count',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.utils import timezone
 
@@ -27,6 +29,9 @@ class DataFile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     file_size = models.BigIntegerField(null=True, blank=True)
     original_filename = models.CharField(max_length=255, null=True, blank=True)
+    columnar_file = models.FileField(max_length=255, null=True, blank=True)
+    row_count = models.BigIntegerField(null=True, blank=True)
+    column_names = models.JSONField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
         if self.file and not self.file_size:
@@ -38,5 +43,163 @@ class DataFile(models.Model):
             self.original_filename = getattr(self.file, 'name', None)
         super().save(*args, **kwargs)
 
+    def store_shape(self, row_count: int, column_names: list) -> None:
+        self.row_count = row_count
+        self.column_names = column_names
+        DataFile.objects.filter(pk=self.pk).update(row_count=row_count, column_names=column_names)
+
+    async def astore_shape(self, row_count: int, column_names: list) -> None:
+        self.row_count = row_count
+        self.column_names = column_names
+        await DataFile.objects.filter(pk=self.pk).aupdate(row_count=row_count, column_names=column_names)
+
+    def stored_files(self) -> list:
+        """Storage names of the upload and of everything derived from it (Parquet sidecar, column indexes)."""
+        names = [self.file.name, self.columnar_file.name] + [index.file.name for index in self.indexes.all()]
+        return [name for name in names if name]
+
     def __str__(self):
         return f"DataFile({self.id})"
+
+
+class DatasetStats(models.Model):
+    """Row count, schema and per-column statistics computed once per upload."""
+    datafile = models.OneToOneField(DataFile, on_delete=models.CASCADE, related_name='stats')
+    row_count = models.BigIntegerField()
+    schema = models.JSONField(default=list)
+    columns = models.JSONField(default=dict)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def fresh_for(datafile):
+        stats = DatasetStats.objects.filter(datafile=datafile).first()
+        if stats is None or stats.file_size != datafile.file_size:
+            return None
+        return stats
+
+    @staticmethod
+    async def afresh_for(datafile):
+        stats = await DatasetStats.objects.filter(datafile=datafile).afirst()
+        if stats is None or stats.file_size != datafile.file_size:
+            return None
+        return stats
+
+    @staticmethod
+    def store(datafile, result: dict):
+        stats, _ = DatasetStats.objects.update_or_create(
+            datafile=datafile,
+            defaults={
+                "row_count": result["row_count"],
+                "schema": result["schema"],
+                "columns": result["columns"],
+                "file_size": datafile.file_size,
+            },
+        )
+        return stats
+
+    @staticmethod
+    async def astore(datafile, result: dict):
+        stats, _ = await DatasetStats.objects.aupdate_or_create(
+            datafile=datafile,
+            defaults={
+                "row_count": result["row_count"],
+                "schema": result["schema"],
+                "columns": result["columns"],
+                "file_size": datafile.file_size,
+            },
+        )
+        return stats
+
+    def __str__(self):
+        return f"DatasetStats({self.datafile_id})"
+
+
+class TrendRollup(models.Model):
+    """Daily count/sum/sum-of-squares of every numeric column, bucketed by one date column.
+
+    ``data`` is columnar: ``{"days": [...], "rows": [...], "unparsed": n, "columns": {name: {"count", "sum", "sumsq"}}}``;
+    ``unparsed`` counts rows whose date did not parse and were left out of the bins.
+    """
+    datafile = models.ForeignKey(DataFile, on_delete=models.CASCADE, related_name='rollups')
+    date_column = models.CharField(max_length=255)
+    data = models.JSONField(default=dict)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [('datafile', 'date_column')]
+
+    @staticmethod
+    def fresh_for(datafile, date_column: str):
+        rollup = TrendRollup.objects.filter(datafile=datafile, date_column=date_column).first()
+        if rollup is None or rollup.file_size != datafile.file_size:
+            return None
+        return rollup
+
+    @staticmethod
+    async def afresh_for(datafile, date_column: str):
+        rollup = await TrendRollup.objects.filter(datafile=datafile, date_column=date_column).afirst()
+        if rollup is None or rollup.file_size != datafile.file_size:
+            return None
+        return rollup
+
+    @staticmethod
+    def store(datafile, date_column: str, data: dict):
+        rollup, _ = TrendRollup.objects.update_or_create(
+            datafile=datafile,
+            date_column=date_column,
+            defaults={"data": data, "file_size": datafile.file_size},
+        )
+        return rollup
+
+    def __str__(self):
+        return f"TrendRollup({self.datafile_id}, {self.date_column})"
+
+
+class ColumnIndex(models.Model):
+    """Persisted secondary index over one column of a dataset's Parquet sidecar."""
+    SORTED = 'sorted'
+    TRIGRAM = 'trigram'
+    KIND_CHOICES = [(SORTED, 'Sorted value/row-id'), (TRIGRAM, 'Trigram postings')]
+
+    datafile = models.ForeignKey(DataFile, on_delete=models.CASCADE, related_name='indexes')
+    column = models.CharField(max_length=255)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=SORTED)
+    file = models.FileField(max_length=512)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('datafile', 'column', 'kind')]
+
+    def __str__(self):
+        return f"ColumnIndex({self.datafile_id}, {self.column}, {self.kind})"
+
+
+class OutboxEvent(models.Model):
+    """Event written in the same transaction as the change it describes; relayed by ``outbox.relay_events``.
+
+    ``dispatched_at`` is set once the local work the event triggers has been
+    enqueued, ``published_at`` once Echo has accepted it.
+    """
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='outbox_pending_idx', condition=models.Q(published_at__isnull=True)),
+            models.Index(fields=['published_at'], name='outbox_published_idx'),
+        ]
+
+    @staticmethod
+    def record(topic: str, payload: dict):
+        return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+    def __str__(self):
+        return f"OutboxEvent({self.id}, {self.topic})"
@@ -0,0 +1,146 @@
+"""Transactional outbox for dataset events.
+
+Views record an ``OutboxEvent`` in the same transaction as the row it
+describes, so an event exists exactly when the change was committed, whatever
+happens to the broker. The relay (the ``relay_outbox`` Celery task, run by beat
+and nudged after each upload, or ``manage.py relay_outbox``) claims pending
+events ``DATASET_OUTBOX_BATCH_SIZE`` at a time with ``SELECT ... FOR UPDATE
+SKIP LOCKED``, so concurrent relays never handle the same event. For each batch
+it enqueues the work each event triggers, publishes the events to Echo (one
+request per event, or one per batch with ``DATASET_OUTBOX_ECHO_BATCH``) and
+marks them published once Echo accepted them.
+
+A crash between publishing and marking sends the events again: delivery is
+at-least-once, and consumers deduplicate on each event's ``idempotency_key``.
+An event Echo rejects ``DATASET_OUTBOX_MAX_ATTEMPTS`` times is set aside
+(``failed`` in ``outbox_stats``) so it cannot hold back the rest.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent
+from .webhooks import publish_echo_batch, publish_echo_event
+
+logger = logging.getLogger(__name__)
+
+DATASET_UPLOADED = "axi.dataset.uploaded"
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_RETENTION_DAYS = 7
+
+
+def batch_key(events: List[OutboxEvent]) -> str:
+    """Idempotency key of a batch: retrying the same events sends the same key."""
+    return hashlib.sha256(",".join(str(e.idempotency_key) for e in events).encode()).hexdigest()
+
+
+def echo_event(event: OutboxEvent) -> Dict[str, Any]:
+    return {
+        "name": event.topic,
+        "data": event.payload,
+        "idempotency_key": str(event.idempotency_key),
+        "occurred_at": event.created_at.isoformat(),
+    }
+
+
+def _dispatch(events: List[OutboxEvent], handler: Callable[[OutboxEvent], None]) -> None:
+    """Run ``handler`` for events not dispatched yet, remembering those that succeeded."""
+    done = []
+    try:
+        for event in events:
+            if event.dispatched_at is None:
+                handler(event)
+                done.append(event.id)
+    finally:
+        if done:
+            OutboxEvent.objects.filter(id__in=done).update(dispatched_at=timezone.now())
+
+
+def _publish(events: List[OutboxEvent]) -> tuple[List[int], List[int], str | None]:
+    """Publish ``events`` in order: ids accepted, ids that failed, and the error that stopped it."""
+    ids = [e.id for e in events]
+    if not getattr(settings, "ECHO_URL", None):
+        return ids, [], None
+    if getattr(settings, "DATASET_OUTBOX_ECHO_BATCH", False):
+        if publish_echo_batch([echo_event(e) for e in events], batch_key(events)):
+            return ids, [], None
+        return [], ids, "Echo batch publish failed"
+    for n, event in enumerate(events):
+        if not publish_echo_event(event.topic, event.payload, idempotency_key=str(event.idempotency_key)):
+            return ids[:n], [event.id], "Echo publish failed"
+    return ids, [], None
+
+
+def _relayable():
+    max_attempts = getattr(settings, "DATASET_OUTBOX_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    return OutboxEvent.objects.filter(published_at__isnull=True, attempts__lt=max_attempts)
+
+
+def relay_events(handler: Callable[[OutboxEvent], None] | None = None,
+                 max_batches: int | None = None) -> Dict[str, Any]:
+    """Claim and relay pending events batch by batch; stops at the first failure.
+
+    Each batch is handled inside the transaction that locked its rows, which
+    other relays skip. A dispatch failure (broker down) leaves the batch as it
+    was; an event Echo refuses counts an attempt. Returns what was relayed plus
+    ``outbox_stats()``.
+    """
+    batch_size = getattr(settings, "DATASET_OUTBOX_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    published = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            events = list(_relayable().select_for_update(skip_locked=True).order_by("id")[:batch_size])
+            if not events:
+                break
+            batches += 1
+            ids = [e.id for e in events]
+            try:
+                if handler is not None:
+                    _dispatch(events, handler)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                OutboxEvent.objects.filter(id__in=ids).update(last_error=error)
+                logger.warning(f"Outbox batch not dispatched - events: {ids[0]}..{ids[-1]}, error: {error}")
+                break
+            accepted, failed, error = _publish(events)
+            if accepted:
+                OutboxEvent.objects.filter(id__in=accepted).update(published_at=timezone.now(), last_error="")
+                published += len(accepted)
+            if error:
+                OutboxEvent.objects.filter(id__in=failed).update(attempts=F("attempts") + 1, last_error=error)
+                logger.warning(f"Outbox events not published - events: {failed[0]}..{failed[-1]}, error: {error}")
+                break
+    _prune()
+    stats = {"published": published, "batches": batches, **outbox_stats()}
+    if published or stats["pending"]:
+        logger.info(f"Outbox relay - published: {published}, pending: {stats['pending']}, "
+                    f"lag: {stats['lag_seconds']}s")
+    return stats
+
+
+def _prune() -> None:
+    days = getattr(settings, "DATASET_OUTBOX_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    OutboxEvent.objects.filter(published_at__lt=timezone.now() - timedelta(days=days)).delete()
+
+
+def outbox_stats() -> Dict[str, Any]:
+    """Backlog and lag: ``lag_seconds`` is the age of the oldest event still being relayed."""
+    now = timezone.now()
+    pending = _relayable()
+    oldest = pending.order_by("id").values_list("created_at", flat=True).first()
+    return {
+        "pending": pending.count(),
+        "failed": OutboxEvent.objects.filter(published_at__isnull=True).count() - pending.count(),
+        "undispatched": pending.filter(dispatched_at__isnull=True).count(),
+        "lag_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+        "published_last_hour": OutboxEvent.objects.filter(published_at__gte=now - timedelta(hours=1)).count(),
+    }
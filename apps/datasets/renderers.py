@@ -0,0 +1,254 @@
+"""Renderers that serialize columnar results in bulk.
+
+``FastJSONRenderer`` is the project's default JSON renderer: it encodes with
+orjson and splices in ``RawJSON`` fragments that were built column-at-a-time
+from Arrow tables (``records_json``), so large pages never become Python dicts.
+
+The tabular renderers for /rows write the page straight from the Arrow table.
+Views hand them a ``pyarrow.Table``; anything else (error payloads) is
+rendered as JSON so clients still get a readable error body.
+"""
+from __future__ import annotations
+
+import io
+import json
+import uuid
+from typing import Iterable, Iterator
+
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+class RawJSON:
+    """Already-encoded JSON to embed as-is in a response payload."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _quoted(strings: pa.Array) -> pa.Array:
+    escaped = pc.replace_substring(strings, "\\", "\\\\")
+    escaped = pc.replace_substring(escaped, '"', '\\"')
+    return pc.binary_join_element_wise('"', escaped, '"', "")
+
+
+def _json_values(column: pa.ChunkedArray) -> pa.Array:
+    """Each value of ``column`` as a JSON literal, null where missing."""
+    column = column.combine_chunks()
+    dtype = column.type
+    if pa.types.is_dictionary(dtype):
+        column = column.cast(dtype.value_type)
+        dtype = column.type
+    if pa.types.is_integer(dtype) or pa.types.is_boolean(dtype):
+        values = column.cast(pa.string())
+    elif pa.types.is_floating(dtype):
+        finite = pc.if_else(pc.is_finite(column), column, pa.scalar(None, dtype))
+        values = finite.cast(pa.string())
+        # Keep floats recognizable as floats: "2" -> "2.0", like the stdlib encoder.
+        integral = pc.match_substring_regex(values, r"^-?[0-9]+$")
+        values = pc.if_else(integral, pc.binary_join_element_wise(values, ".0", ""), values)
+    elif pa.types.is_date(dtype):
+        values = _quoted(column.cast(pa.string()))
+    elif (pa.types.is_string(dtype) or pa.types.is_large_string(dtype)) and not pc.any(
+            pc.match_substring_regex(column, "[\\x00-\\x1f]")).as_py():
+        values = _quoted(column.cast(pa.string()))
+    else:
+        # Control characters, timestamps and nested types: encode value by value.
+        values = pa.array(
+            [orjson.dumps(v, default=encoders.JSONEncoder().default, option=ORJSON_OPTIONS).decode()
+             for v in column.to_pylist()],
+            pa.string(),
+        )
+    return pc.fill_null(values, "null")
+
+
+def _json_rows(table: pa.Table) -> pa.Array:
+    """Each row of ``table`` as a JSON object; ``table`` has at least one column and row."""
+    parts = []
+    for i, name in enumerate(table.column_names):
+        parts.append(pa.scalar(("{" if i == 0 else ",") + json.dumps(name, ensure_ascii=False) + ":"))
+        parts.append(_json_values(table.column(name)))
+    parts.append(pa.scalar("}"))
+    return pc.binary_join_element_wise(*parts, "")
+
+
+def _join(rows: pa.Array, separator: str) -> bytes:
+    joined = pc.binary_join(pa.ListArray.from_arrays(pa.array([0, len(rows)], pa.int32()), rows), separator)
+    return joined[0].as_buffer().to_pybytes()
+
+
+def records_json(table: pa.Table) -> RawJSON:
+    """``table.to_pylist()`` as a JSON array, built with vectorized string kernels."""
+    if table.num_rows == 0:
+        return RawJSON(b"[]")
+    if table.num_columns == 0:
+        return RawJSON(b"[" + b",".join([b"{}"] * table.num_rows) + b"]")
+    return RawJSON(b"[" + _join(_json_rows(table), ",") + b"]")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` backed by orjson, with ``RawJSON`` fragments spliced in verbatim.
+
+    NaN and infinities are written as null. Indented output (browsable API,
+    ``; indent=`` media type parameter) goes through the stdlib renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(json.loads(self.dumps(data)), accepted_media_type, renderer_context)
+        return self.dumps(data)
+
+    @staticmethod
+    def dumps(data) -> bytes:
+        fragments = {}
+
+        def default(obj):
+            if isinstance(obj, RawJSON):
+                token = uuid.uuid4().hex
+                fragments[token] = obj.data
+                return token
+            return encoders.JSONEncoder().default(obj)
+
+        ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        for token, fragment in fragments.items():
+            ret = ret.replace(b'"' + token.encode() + b'"', fragment, 1)
+        # Same escaping as JSONRenderer: these are valid JSON but not valid JavaScript.
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class TableRenderer(BaseRenderer):
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, pa.Table):
+            response = (renderer_context or {}).get("response")
+            if response is not None:
+                response["Content-Type"] = FastJSONRenderer.media_type
+            return FastJSONRenderer().render(data, FastJSONRenderer.media_type, renderer_context)
+        return self.render_table(data)
+
+    def render_table(self, table: pa.Table) -> bytes:
+        raise NotImplementedError
+
+    def stream(self, schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+        """Encode ``batches`` incrementally, yielding bytes as each batch is written.
+
+        If ``batches`` fails, the writer is not closed (a Parquet file gets no
+        footer), ``error_trailer`` is sent and the error is re-raised so the
+        server aborts the response instead of ending it like a complete file.
+        """
+        sink = _ChunkSink()
+        writer = self.open_writer(pa.PythonFile(sink, mode="w"), schema)
+        try:
+            for batch in batches:
+                writer.write_batch(batch)
+                yield sink.drain()
+        except Exception as e:
+            yield sink.drain() + self.error_trailer(e)
+            raise
+        writer.close()
+        yield sink.drain()
+
+    def error_trailer(self, error: Exception) -> bytes:
+        return b""
+
+    def open_writer(self, sink: pa.NativeFile, schema: pa.Schema):
+        raise NotImplementedError
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands its contents out in pieces but keeps a growing ``tell()``."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class ArrowStreamRenderer(TableRenderer):
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+
+    def render_table(self, table: pa.Table) -> bytes:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    def open_writer(self, sink, schema):
+        return pa.ipc.new_stream(sink, schema)
+
+
+class ParquetRenderer(TableRenderer):
+    media_type = "application/x-parquet"
+    format = "parquet"
+
+    def render_table(self, table: pa.Table) -> bytes:
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink)
+        return sink.getvalue().to_pybytes()
+
+    def open_writer(self, sink, schema):
+        return pq.ParquetWriter(sink, schema)
+
+
+class CSVRenderer(TableRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render_table(self, table: pa.Table) -> bytes:
+        sink = pa.BufferOutputStream()
+        pacsv.write_csv(table, sink, write_options=pacsv.WriteOptions(quoting_style="needed"))
+        return sink.getvalue().to_pybytes()
+
+    def open_writer(self, sink, schema):
+        return pacsv.CSVWriter(sink, schema, write_options=pacsv.WriteOptions(quoting_style="needed"))
+
+    def error_trailer(self, error: Exception) -> bytes:
+        message = " ".join(str(error).split())
+        return f"# export failed: {message}\n".encode()
+
+
+class NDJSONRenderer(TableRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render_table(self, table: pa.Table) -> bytes:
+        if table.num_rows == 0:
+            return b""
+        if table.num_columns == 0:
+            return b"{}\n" * table.num_rows
+        # Same column-at-a-time encoding as records_json: integers stay integers even with nulls.
+        return _join(_json_rows(table), "\n") + b"\n"
+
+
+TABLE_RENDERERS = [ArrowStreamRenderer, ParquetRenderer, NDJSONRenderer]
@@ -0,0 +1,135 @@
+"""Daily pre-aggregates per date column, so /trend answers without scanning rows.
+
+The upload task detects date-like columns on the first record batch and keeps,
+for every day, the number of rows with a parseable date plus the count, sum and
+sum of squares of each numeric column. Rows whose date does not parse are left
+out of the bins, as ``services.compute_trend`` does, and counted as ``unparsed``. Trends of a day or longer (``W``, ``M``,
+``2D``, ``QS``...) are re-resampled from the daily bins.
+"""
+from __future__ import annotations
+
+import warnings
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.tseries.offsets import Day, Tick
+
+from .services import check_period_count, freq_offset, parse_dates, resample, trend_columns
+from .streaming import is_numeric
+
+DATE_SAMPLE_ROWS = 1000
+# Share of sampled non-null values that must parse for a column to count as a date.
+DATE_PARSE_RATE = 0.9
+ROLLUP_AGGS = {"sum", "mean", "count"}
+
+
+def _parse_dates(array: pa.Array | pa.ChunkedArray) -> pd.DatetimeIndex:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return parse_dates(array.to_pandas())
+
+
+def date_columns(batch: pa.RecordBatch) -> List[str]:
+    """String columns where at least ``DATE_PARSE_RATE`` of the sampled non-null values parse as datetimes."""
+    found = []
+    for name, array in zip(batch.schema.names, batch.columns):
+        if not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+            continue
+        sample = array.drop_null()[:DATE_SAMPLE_ROWS]
+        if len(sample) == 0:
+            continue
+        if _parse_dates(sample).notna().mean() >= DATE_PARSE_RATE:
+            found.append(name)
+    return found
+
+
+class DailyRollupAccumulator:
+    """Per-day partial aggregates for every detected date column; feed it record batches."""
+
+    def __init__(self):
+        self.date_cols: List[str] | None = None
+        self.numeric_cols: List[str] = []
+        self.parts: Dict[str, pd.DataFrame] = {}
+        self.unparsed: Dict[str, int] = {}
+        self.tz: Dict[str, Any] = {}
+
+    def update(self, batch: pa.RecordBatch) -> None:
+        if self.date_cols is None:
+            self.date_cols = date_columns(batch)
+            self.numeric_cols = [f.name for f in batch.schema if is_numeric(f.type)]
+        if not self.date_cols:
+            return
+        values = {}
+        for name in self.numeric_cols:
+            x = pc.cast(batch.column(name), pa.float64()).to_numpy(zero_copy_only=False)
+            valid = ~np.isnan(x)
+            filled = np.where(valid, x, 0.0)
+            values[f"{name}\0count"] = valid.astype(np.int64)
+            values[f"{name}\0sum"] = filled
+            values[f"{name}\0sumsq"] = filled * filled
+        for date_col in list(self.date_cols):
+            dates = _parse_dates(batch.column(date_col))
+            if self.tz.setdefault(date_col, dates.tz) != dates.tz:
+                # Offsets differ across batches (day boundaries would too): leave it to the raw-scan path.
+                self.date_cols.remove(date_col)
+                self.parts.pop(date_col, None)
+                continue
+            frame = pd.DataFrame({"rows": np.ones(batch.num_rows, dtype=np.int64), **values})
+            keep = dates.notna()
+            self.unparsed[date_col] = self.unparsed.get(date_col, 0) + int((~keep).sum())
+            days = dates[keep].tz_localize(None) if dates.tz is not None else dates[keep]
+            part = frame[keep].groupby(days.floor("D").to_numpy()).sum()
+            prev = self.parts.get(date_col)
+            self.parts[date_col] = part if prev is None else prev.add(part, fill_value=0)
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for date_col in self.date_cols or []:
+            part = self.parts.get(date_col)
+            if part is None:
+                continue
+            part = part.sort_index()
+            out[date_col] = {
+                "days": [str(d.date()) for d in part.index],
+                "rows": part["rows"].astype("int64").tolist(),
+                "unparsed": self.unparsed.get(date_col, 0),
+                "columns": {
+                    name: {
+                        "count": part[f"{name}\0count"].astype("int64").tolist(),
+                        "sum": part[f"{name}\0sum"].tolist(),
+                        "sumsq": part[f"{name}\0sumsq"].tolist(),
+                    }
+                    for name in self.numeric_cols
+                },
+            }
+        return out
+
+
+def rollup_covers(data: Dict[str, Any], value_cols: List[str], freq: str, aggs: List[str]) -> bool:
+    """Whether daily bins can answer the request: additive aggregates over whole days."""
+    if any(agg not in ROLLUP_AGGS for agg in aggs):
+        return False
+    offset = freq_offset(freq)
+    if isinstance(offset, Tick) and offset.nanos % Day().nanos:
+        return False
+    return aggs == ["count"] or all(c in data.get("columns", {}) for c in value_cols)
+
+
+def rollup_trend(data: Dict[str, Any], value_cols: List[str], freq: str, aggs: List[str]) -> Dict[str, Any]:
+    """``services.compute_trend`` answered from a stored daily rollup."""
+    index = pd.DatetimeIndex(pd.to_datetime(data.get("days", [])))
+    if len(index):
+        check_period_count(index.min(), index.max(), freq)
+    rows = resample(pd.DataFrame({"rows": data.get("rows", [])}, index=index, dtype="float64"), freq).sum()
+    measures = [a for a in aggs if a != "count"]
+    values = {}
+    for name in value_cols if measures else []:
+        column = data["columns"][name]
+        part = resample(pd.DataFrame({"count": column["count"], "sum": column["sum"]}, index=index,
+                                     dtype="float64"), freq).sum()
+        means = (part["sum"] / part["count"]).where(part["count"] > 0)
+        values[name] = {agg: (part["sum"] if agg == "sum" else means).to_numpy() for agg in measures}
+    return trend_columns(rows.index, rows["rows"].to_numpy() if "count" in aggs else None, values)
@@ -1,11 +1,34 @@
 from rest_framework import serializers
 
+from .services import parse_aggs, parse_freq
+
 
 class TrendParamsSerializer(serializers.Serializer):
+    """``value`` and ``agg`` take comma-separated lists; ``freq`` any pandas frequency."""
+
     date = serializers.CharField(required=True)
     value = serializers.CharField(required=False)
-    freq = serializers.ChoiceField(choices=["D", "W", "M"], default="D")
-    agg = serializers.ChoiceField(choices=["sum", "mean", "count"], default="sum")
+    freq = serializers.CharField(default="D")
+    agg = serializers.CharField(default="sum")
+
+    def validate_value(self, value):
+        return list(dict.fromkeys(c.strip() for c in value.split(",") if c.strip()))
+
+    def validate_freq(self, value):
+        try:
+            return parse_freq(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_agg(self, value):
+        try:
+            return parse_aggs(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class CohortParamsSerializer(serializers.Serializer):
+    freq = serializers.ChoiceField(choices=["D", "W", "M"], default="M")
 
 
 class RowsParamsSerializer(serializers.Serializer):
@@ -13,6 +36,17 @@ class RowsParamsSerializer(serializers.Serializer):
     sort = serializers.CharField(required=False)
     page = serializers.IntegerField(required=False, min_value=1, default=1)
     page_size = serializers.IntegerField(required=False, min_value=1, max_value=100, default=50)
+    cursor = serializers.CharField(required=False)
+
+
+class ExportParamsSerializer(serializers.Serializer):
+    columns = serializers.CharField(required=False)
+    sort = serializers.CharField(required=False)
+
+
+class JobRequestSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=["summary", "correlation", "trend", "cohort"])
+    params = serializers.DictField(required=False, default=dict)
 
 
 class FileUploadSerializer(serializers.Serializer):
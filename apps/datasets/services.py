@@ -1,5 +1,14 @@
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
+import base64
+import json
+import re
+import warnings
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from django.conf import settings
+from pandas.tseries.frequencies import to_offset
 
 
 class DataReadError(Exception):
@@ -23,68 +32,197 @@ def validate_columns(df: pd.DataFrame, cols: List[str]) -> None:
         raise ValueError(f"Missing columns: {missing}")
 
 
-def select_columns(df: pd.DataFrame, columns: List[str] | None) -> pd.DataFrame:
-    if not columns:
-        return df
-    validate_columns(df, columns)
-    return df[columns]
-
-
-def _op_filter(series: pd.Series, op: str, value: str) -> pd.Series:
-    if op == 'eq':
-        return series == value
-    if op == 'neq':
-        return series != value
-    if op == 'gt':
-        return series.astype(float) > float(value)
-    if op == 'gte':
-        return series.astype(float) >= float(value)
-    if op == 'lt':
-        return series.astype(float) < float(value)
-    if op == 'lte':
-        return series.astype(float) <= float(value)
+def typed_literal(dtype: pa.DataType, value: str) -> pa.Scalar | None:
+    if pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+        return pa.scalar(value, dtype)
+    try:
+        return pc.cast(pa.scalar(value), dtype)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+
+def _op_expression(field: pc.Expression, dtype: pa.DataType, op: str, value: str) -> pc.Expression:
+    if op in ('eq', 'neq'):
+        literal = typed_literal(dtype, value)
+        if literal is None:
+            # The value can never equal anything of this column's type.
+            return pc.scalar(op == 'neq') & field.is_valid()
+        return field == literal if op == 'eq' else field != literal
+    if op in ('gt', 'gte', 'lt', 'lte'):
+        number = pc.scalar(float(value))
+        target = field if pa.types.is_integer(dtype) or pa.types.is_floating(dtype) else field.cast(pa.float64())
+        return {
+            'gt': target > number,
+            'gte': target >= number,
+            'lt': target < number,
+            'lte': target <= number,
+        }[op]
     if op == 'contains':
-        return series.astype(str).str.contains(value, na=False)
+        return pc.match_substring(field.cast(pa.string()), value)
+    if op == 'regex':
+        return pc.match_substring_regex(field.cast(pa.string()), value)
     if op == 'in':
-        values = set(value.split('|'))
-        return series.astype(str).isin(values)
+        return pc.is_in(field.cast(pa.string()), value_set=pa.array(value.split('|'), pa.string()))
     raise ValueError(f"Invalid op: {op}")
 
 
-def apply_filters(df: pd.DataFrame, filters: List[Tuple[str, str, str]]) -> pd.DataFrame:
+def compile_filters(schema: pa.Schema, filters: List[Tuple[str, str, str]]) -> pc.Expression | None:
+    """Combine ``f=col,op,value`` filters into one Arrow expression.
+
+    Literals are converted to each column's type once, here, so the expression
+    can be evaluated during the scan. Filters on unknown columns are skipped.
+    """
+    expr = None
     for col, op, val in filters:
-        if col not in df.columns:
+        if col not in schema.names:
             continue
-        mask = _op_filter(df[col], op, val)
-        df = df[mask]
-    return df
+        term = _op_expression(pc.field(col), schema.field(col).type, op, val)
+        expr = term if expr is None else expr & term
+    return expr
 
 
-def apply_sort(df: pd.DataFrame, sort_expr: str | None) -> pd.DataFrame:
+def parse_sort(sort_expr: str | None) -> List[Tuple[str, bool]]:
+    """``"a,-b"`` -> ``[("a", True), ("b", False)]`` (field, ascending)."""
     if not sort_expr:
-        return df
-    fields = []
-    ascending = []
+        return []
+    keys = []
     for part in sort_expr.split(','):
         part = part.strip()
         if part.startswith('-'):
-            fields.append(part[1:])
-            ascending.append(False)
+            keys.append((part[1:], False))
         else:
-            fields.append(part)
-            ascending.append(True)
-    return df.sort_values(by=fields, ascending=ascending)
+            keys.append((part, True))
+    return keys
 
 
-def paginate(records: List[Dict[str, Any]], page: int, page_size: int) -> Dict[str, Any]:
-    total = len(records)
-    start = (page - 1) * page_size
-    end = start + page_size
+ROW_POSITION = "__row__"
+
+
+def encode_cursor(sort_expr: str | None, values: List[Any], position: int) -> str:
+    raw = json.dumps({"s": sort_expr or "", "k": values, "p": position}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_expr: str | None) -> Tuple[List[Any], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values, position = list(data["k"]), int(data["p"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if data.get("s", "") != (sort_expr or ""):
+        raise ValueError("Cursor does not match sort")
+    return values, position
+
+
+def _after_cursor(schema: pa.Schema, keys: List[Tuple[str, bool]], values: List[Any], position: int) -> pc.Expression:
+    """Rows that come strictly after the cursor row in ``keys`` order (nulls last)."""
+    expr = pc.field(ROW_POSITION) > pc.scalar(position)
+    for (name, ascending), value in reversed(list(zip(keys, values))):
+        field = pc.field(name)
+        if value is None:
+            # Only nulls can tie with a null, and nothing sorts after them.
+            expr = field.is_null() & expr
+            continue
+        literal = pc.cast(pa.scalar(value), schema.field(name).type)
+        after = (field > literal) if ascending else (field < literal)
+        expr = (after | field.is_null()) | ((field == literal) & expr)
+    return expr
+
+
+TOPK_MAX_SHARE = 8
+
+
+def sort_order(table: pa.Table, keys: List[Tuple[str, bool]], k: int | None = None) -> pa.Array:
+    """Row indices of ``table`` in ``keys`` order (ties by row position, nulls last).
+
+    When only the first ``k`` rows are needed and that is a small share of the
+    table, a top-k selection replaces the full sort. ``select_k_unstable`` drops
+    nulls, so it is only used when no sort column has any.
+    """
+    order = [(f, "ascending" if asc else "descending") for f, asc in keys] + [(ROW_POSITION, "ascending")]
+    no_nulls = all(table.column(f).null_count == 0 for f, _ in keys)
+    if k is not None and no_nulls and k * TOPK_MAX_SHARE < table.num_rows:
+        top = pc.select_k_unstable(table, k, sort_keys=order)
+        return top.take(pc.sort_indices(table.take(top), sort_keys=order))
+    return pc.sort_indices(table, sort_keys=order, null_placement="at_end")
+
+
+def page_payload(meta: Dict[str, Any], results: Any) -> Dict[str, Any]:
     return {
+        "page": meta["page"],
+        "page_size": meta["page_size"],
+        "total": meta["total"],
+        "results": results,
+        "next_cursor": meta["next_cursor"],
+    }
+
+
+def paginate_table(table: pa.Table, page: int, page_size: int, sort_expr: str | None = None,
+                   cursor: str | None = None, columns: List[str] | None = None,
+                   order_cache=None, order_key=None) -> Tuple[pa.Table, Dict[str, Any]]:
+    """Sort and slice ``table``; return the page as a table plus pagination metadata.
+
+    Without ``cursor`` the page is addressed by offset. With it, only rows after
+    the cursor's keyset position are considered, so deep pages do not start
+    from row zero. ``next_cursor`` resumes after the last returned row.
+
+    ``order_cache`` (``get``/``put``/``wants`` keyed by ``order_key``) keeps full
+    sort permutations for sorts that are requested repeatedly; with one cached,
+    any page or cursor position is an index lookup.
+    """
+    keys = parse_sort(sort_expr)
+    missing = [c for c in (columns or []) + [f for f, _ in keys] if c not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    total = table.num_rows
+    table = table.append_column(ROW_POSITION, pa.array(np.arange(total, dtype=np.int64)))
+    start = (page - 1) * page_size
+    values = position = None
+    if cursor:
+        values, position = decode_cursor(cursor, sort_expr)
+        if len(values) != len(keys):
+            raise ValueError("Invalid cursor")
+
+    permutation = None
+    if keys and order_cache is not None:
+        permutation = order_cache.get(order_key)
+        if permutation is None and order_cache.wants(order_key):
+            permutation = sort_order(table, keys)
+            order_cache.put(order_key, permutation)
+
+    if permutation is not None:
+        candidates = permutation
+        if cursor:
+            found = pc.index(permutation, position).as_py()
+            if found < 0:
+                raise ValueError("Invalid cursor")
+            start = found + 1
+        page_table = table.take(permutation[start:start + page_size])
+    else:
+        if cursor:
+            table = table.filter(_after_cursor(table.schema, keys, values, position))
+            start = 0
+        candidates = table
+        if keys:
+            page_table = table.take(sort_order(table, keys, start + page_size)[start:start + page_size])
+        else:
+            page_table = table.slice(start, page_size)
+
+    next_cursor = None
+    if page_table.num_rows and start + page_table.num_rows < len(candidates):
+        last = page_table.slice(page_table.num_rows - 1)
+        next_cursor = encode_cursor(
+            sort_expr,
+            [last.column(f)[0].as_py() for f, _ in keys],
+            last.column(ROW_POSITION)[0].as_py(),
+        )
+    output = columns or [c for c in page_table.column_names if c != ROW_POSITION]
+    return page_table.select(output), {
         "page": page,
         "page_size": page_size,
         "total": total,
-        "results": records[start:end],
+        "next_cursor": next_cursor,
     }
 
 
@@ -99,21 +237,255 @@ def compute_correlation(df: pd.DataFrame, cols: List[str] | None = None) -> Dict
     return {c: corr[c].to_dict() for c in corr.columns}
 
 
-def compute_trend(df: pd.DataFrame, date_col: str, value_col: str, freq: str, agg: str) -> Dict[str, Any]:
+TREND_AGGS = ("sum", "mean", "count", "min", "max", "median")
+# Aggregates rebuilt from per-period partials (daily rollups, record batches).
+MERGEABLE_AGGS = {"sum", "mean", "count", "min", "max"}
+_PERCENTILE = re.compile(r"p(\d{1,2}(?:\.\d+)?)")
+DEFAULT_TREND_MAX_PERIODS = 100_000
+
+
+def percentile(agg: str) -> float | None:
+    """Quantile for ``pNN`` aggregates (``p95`` -> 0.95), else None."""
+    match = _PERCENTILE.fullmatch(agg)
+    if match is None or not 0 < float(match.group(1)) < 100:
+        return None
+    return float(match.group(1)) / 100
+
+
+def parse_aggs(value: str) -> List[str]:
+    aggs = list(dict.fromkeys(a.strip() for a in value.split(",") if a.strip()))
+    invalid = [a for a in aggs if a not in TREND_AGGS and percentile(a) is None]
+    if invalid or not aggs:
+        raise ValueError(f"Invalid agg {invalid} (use sum, mean, count, min, max, median or p1-p99)")
+    return aggs
+
+
+def freq_offset(freq: str):
+    with warnings.catch_warnings():
+        # "M" still works but warns in favour of "ME".
+        warnings.simplefilter("ignore", FutureWarning)
+        return to_offset(freq)
+
+
+def parse_freq(freq: str) -> str:
+    """``freq`` if pandas understands it as a resampling frequency (``D``, ``15min``, ``2W``, ``QS``...)."""
+    try:
+        freq_offset(freq)
+    except ValueError:
+        raise ValueError(f"Invalid freq {freq!r}")
+    return freq
+
+
+def resample(frame: pd.DataFrame, freq: str):
+    # Fixed-width bins (2D, 90min) start at the epoch rather than at the first
+    # row, so partial aggregates of different batches share their bin edges.
+    # The parsed offset, so "M" does not warn on every call.
+    return frame.resample(freq_offset(freq), origin="epoch")
+
+
+def period_count(first: pd.Timestamp, last: pd.Timestamp, freq: str) -> int:
+    """Estimated number of ``freq`` periods between ``first`` and ``last`` (never fewer than resample makes)."""
+    offset = freq_offset(freq)
+    # One full step after rolling forward: anchored offsets (W, M) would otherwise measure a partial period.
+    start = pd.Timestamp("2000-01-03") + offset
+    step = (start + offset) - start
+    return int((last - first) / step) + 2
+
+
+def check_period_count(first: pd.Timestamp, last: pd.Timestamp, freq: str) -> None:
+    """Refuse frequencies that would bin the date range into more than ``DATASET_TREND_MAX_PERIODS`` periods."""
+    limit = getattr(settings, "DATASET_TREND_MAX_PERIODS", DEFAULT_TREND_MAX_PERIODS)
+    count = period_count(first, last, freq)
+    if count > limit:
+        raise ValueError(f"freq {freq!r} would produce about {count} periods for this date range "
+                         f"(max {limit}); use a coarser freq")
+
+
+def parse_dates(values: pd.Series) -> pd.DatetimeIndex:
+    """``pd.to_datetime(values, errors="coerce")``, parsing each distinct value once."""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce")
+    if not pd.api.types.is_datetime64_any_dtype(parsed):
+        # Mixed time zones: no common dtype to gather into.
+        return pd.DatetimeIndex(pd.to_datetime(values, errors="coerce", utc=True))
+    return pd.DatetimeIndex(parsed).take(codes, allow_fill=True, fill_value=pd.NaT)
+
+
+def _numeric(series: pd.Series, name: str) -> np.ndarray:
+    if not (pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype)):
+        raise ValueError(f"Value column {name!r} is not numeric")
+    return series.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def compute_trend(df: pd.DataFrame, date_col: str, value_cols: List[str], freq: str,
+                  aggs: List[str]) -> Dict[str, Any]:
+    """Every aggregate in ``aggs`` of every column in ``value_cols``, per period of ``date_col``.
+
+    Rows are bucketed once; each aggregate is then a single vectorized
+    reduction over all value columns. See ``trend_columns`` for the result.
+    """
     if date_col not in df.columns:
         raise ValueError("Missing date column")
-    if agg != "count" and value_col not in df.columns:
+    measures = [a for a in aggs if a != "count"]
+    if measures and (not value_cols or any(c not in df.columns for c in value_cols)):
         raise ValueError("Missing value column for non-count agg")
+    if not measures:
+        value_cols = []
+
+    dates = parse_dates(df[date_col])
+    keep = dates.notna()
+    if keep.any():
+        check_period_count(dates[keep].min(), dates[keep].max(), freq)
+    frame = pd.DataFrame({c: _numeric(df[c], c)[keep] for c in value_cols}, index=dates[keep])
+    # Sorted once here; resample would otherwise sort for every reduction.
+    bins = resample(frame.sort_index(), freq)
+    counts = bins.size()
+    values: Dict[str, Dict[str, np.ndarray]] = {c: {} for c in value_cols}
+    for agg in measures:
+        q = percentile(agg)
+        part = bins.quantile(q) if q is not None else getattr(bins, agg)()
+        for c in value_cols:
+            values[c][agg] = part[c].to_numpy()
+    return trend_columns(counts.index, counts.to_numpy() if "count" in aggs else None, values)
+
+
+def period_strings(index: pd.DatetimeIndex) -> List[str]:
+    """``YYYY-MM-DD`` labels, with the time of day when periods are shorter than a day."""
+    fmt = "%Y-%m-%d" if (index == index.normalize()).all() else "%Y-%m-%dT%H:%M:%S"
+    return index.strftime(fmt).tolist()
+
+
+def trend_columns(index: pd.DatetimeIndex, counts: np.ndarray | None,
+                  values: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
+    """Columnar trend: ``{"periods": [...], "count": [...], "values": {col: {agg: [...]}}}``.
+
+    ``count`` (rows with a parseable date) is present only when requested; empty
+    periods have null aggregates.
+    """
+    out: Dict[str, Any] = {"periods": period_strings(index)}
+    if counts is not None:
+        out["count"] = counts.astype(np.int64).tolist()
+    out["values"] = {col: {agg: _nullable(v) for agg, v in aggs.items()} for col, aggs in values.items()}
+    return out
 
-    s = pd.to_datetime(df[date_col], errors='coerce')
-    df = df.assign(_date=s)
-    if agg == 'count':
-        out = df.set_index('_date').resample(freq)[date_col].count()
-    elif agg == 'sum':
-        out = df.set_index('_date').resample(freq)[value_col].sum()
-    elif agg == 'mean':
-        out = df.set_index('_date').resample(freq)[value_col].mean()
+
+def _nullable(values: np.ndarray) -> list:
+    values = np.asarray(values, dtype="float64")
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def trend_payload(trend: Dict[str, Any], value_cols: List[str], aggs: List[str]) -> Dict[str, Any]:
+    """Response body for /trend: ``{period: value}`` for one value and agg, else the columnar result."""
+    if len(value_cols) > 1 or len(aggs) > 1:
+        return trend
+    if aggs[0] == "count":
+        series = [float(v) for v in trend["count"]]
+    else:
+        series = trend["values"][value_cols[0]][aggs[0]]
+    return dict(zip(trend["periods"], series))
+
+
+COHORT_COLUMNS = ["user_id", "registration_date", "activity_date"]
+# Largest users x periods grid deduplicated with a bitmap (one byte per cell).
+COHORT_BITMAP_CELLS = 256 << 20
+
+
+def period_codes(dates: pa.Array, freq: str) -> pa.Array:
+    """Integer period of each date: days, Monday-based weeks or months since 1970-01.
+
+    Strings are parsed with ``pd.to_datetime(errors="coerce")`` once per distinct
+    value (dates repeat heavily), then mapped back to the rows; unparseable or
+    missing dates give null.
+    """
+    if pa.types.is_timestamp(dates.type) or pa.types.is_date(dates.type):
+        encoded = pc.dictionary_encode(pc.cast(dates, pa.date32()))
+        days = encoded.dictionary.to_numpy(zero_copy_only=False).astype("datetime64[D]")
+    else:
+        encoded = pc.dictionary_encode(pc.cast(dates, pa.string()))
+        parsed = pd.to_datetime(encoded.dictionary.to_pandas(), errors="coerce", utc=True)
+        days = parsed.dt.tz_localize(None).to_numpy().astype("datetime64[D]")
+    missing = np.isnat(days)
+    if freq == "M":
+        codes = days.astype("datetime64[M]").astype(np.int64)
     else:
-        raise ValueError("Invalid agg")
-    return {str(k.date()): (float(v) if v is not None else None) for k, v in out.items()}
+        codes = days.astype(np.int64)
+        if freq == "W":
+            # 1970-01-01 was a Thursday; shift so weeks start on Monday.
+            codes = np.floor_divide(codes + 3, 7)
+    return pc.take(pa.array(codes, pa.int64(), mask=missing), encoded.indices)
+
+
+def period_labels(codes: np.ndarray, freq: str) -> List[str]:
+    """Start of each period as ``YYYY-MM-DD`` (``YYYY-MM`` for months)."""
+    if freq == "M":
+        return codes.astype("datetime64[M]").astype(str).tolist()
+    days = codes * 7 - 3 if freq == "W" else codes
+    return days.astype("datetime64[D]").astype(str).tolist()
+
+
+def cohort_retention(batches: Iterable[pa.RecordBatch], freq: str = "M") -> Dict[str, Any]:
+    """Retention matrix of users grouped by registration period.
+
+    Each user's cohort is the period of their earliest ``registration_date``.
+    ``active[c][k]`` counts the distinct users of cohort ``c`` active ``k``
+    periods after it and ``retention[c][k]`` divides that by the cohort size;
+    periods after the last observed activity are null. Only the integer period
+    codes of each batch are kept. Users are then mapped to dense indices once,
+    and the distinct (user, offset) pairs and the per-cohort counts are computed
+    with array indexing, never per user.
+    """
+    if freq not in {"D", "W", "M"}:
+        raise ValueError("Invalid freq (use D, W, or M)")
+    parts = []
+    for batch in batches:
+        missing = [c for c in COHORT_COLUMNS if c not in batch.schema.names]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+        parts.append(pa.table({
+            "user": batch.column("user_id"),
+            "cohort": period_codes(batch.column("registration_date"), freq),
+            "period": period_codes(batch.column("activity_date"), freq),
+        }).filter(pc.is_valid(batch.column("user_id"))))
+    empty = {"freq": freq, "cohorts": {}, "active": {}, "retention": {}}
+    if not parts:
+        return empty
+    table = pa.concat_tables(parts)
+    users = pc.dictionary_encode(table["user"].combine_chunks())
+    idx = users.indices.to_numpy().astype(np.int64)
+    none = np.iinfo(np.int64).max
+    registered = table["cohort"].fill_null(none).to_numpy()
+    cohort_of = np.full(len(users.dictionary), none)
+    np.minimum.at(cohort_of, idx, registered)
+
+    # Users without a registration date belong to no cohort.
+    in_cohort = cohort_of != none
+    if not in_cohort.any():
+        return empty
+    cohorts, size = np.unique(cohort_of[in_cohort], return_counts=True)
+    active_rows = pc.is_valid(table["period"]).to_numpy(zero_copy_only=False) & in_cohort[idx]
+    user, period = idx[active_rows], table["period"].filter(pa.array(active_rows)).to_numpy()
+    last = int(max(period.max(initial=cohorts[-1]), cohorts[-1]))
+    width = last - int(cohorts[0]) + 1
+    offset = period - cohort_of[user]
+    keep = offset >= 0
+    pairs = _distinct_pairs(user[keep], offset[keep], len(users.dictionary), width)
+    cells = np.searchsorted(cohorts, cohort_of[pairs // width]) * width + pairs % width
+    active = np.bincount(cells, minlength=len(cohorts) * width).reshape(len(cohorts), width)
+
+    observed = np.arange(width)[None, :] <= (last - cohorts)[:, None]
+    labels = period_labels(cohorts, freq)
+    return {
+        "freq": freq,
+        "cohorts": dict(zip(labels, size.tolist())),
+        "active": dict(zip(labels, np.where(observed, active, None).tolist())),
+        "retention": dict(zip(labels, np.where(observed, active / size[:, None], None).tolist())),
+    }
+
 
+def _distinct_pairs(user: np.ndarray, offset: np.ndarray, users: int, width: int) -> np.ndarray:
+    """Distinct ``user * width + offset`` keys, via a bitmap when it is small enough."""
+    if users * width <= COHORT_BITMAP_CELLS:
+        seen = np.zeros(users * width, dtype=bool)
+        seen[user * width + offset] = True
+        return np.flatnonzero(seen)
+    return pd.unique(user * width + offset)
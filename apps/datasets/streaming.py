@@ -0,0 +1,286 @@
+"""Mergeable partial aggregates computed batch by batch over Arrow record batches."""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .services import MERGEABLE_AGGS, check_period_count, parse_dates, resample, trend_columns
+
+
+def is_numeric(dtype: pa.DataType) -> bool:
+    return pa.types.is_integer(dtype) or pa.types.is_floating(dtype)
+
+
+@dataclass
+class ColumnMoments:
+    """Count, null count, min/max and Welford mean/M2 for one column."""
+
+    count: int = 0
+    nulls: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float | None = None
+    max: float | None = None
+
+    @classmethod
+    def from_array(cls, array: pa.Array | pa.ChunkedArray, numeric: bool) -> "ColumnMoments":
+        n = len(array) - array.null_count
+        out = cls(count=n, nulls=array.null_count)
+        if not numeric or n == 0:
+            return out
+        out.mean = pc.mean(array).as_py()
+        out.m2 = pc.variance(array, ddof=0).as_py() * n
+        bounds = pc.min_max(array)
+        out.min = bounds["min"].as_py()
+        out.max = bounds["max"].as_py()
+        return out
+
+    def merge(self, other: "ColumnMoments") -> "ColumnMoments":
+        n = self.count + other.count
+        if other.count == 0:
+            merged = ColumnMoments(self.count, self.nulls, self.mean, self.m2, self.min, self.max)
+        elif self.count == 0:
+            merged = ColumnMoments(other.count, other.nulls, other.mean, other.m2, other.min, other.max)
+        else:
+            delta = other.mean - self.mean
+            merged = ColumnMoments(
+                count=n,
+                nulls=self.nulls,
+                mean=self.mean + delta * other.count / n,
+                m2=self.m2 + other.m2 + delta * delta * self.count * other.count / n,
+                min=_pick(min, self.min, other.min),
+                max=_pick(max, self.max, other.max),
+            )
+        merged.nulls = self.nulls + other.nulls
+        return merged
+
+    @property
+    def std(self) -> float | None:
+        """Sample standard deviation (ddof=1), matching ``DataFrame.describe``."""
+        if self.count < 2:
+            return None
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+    def as_dict(self, numeric: bool) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": self.count, "null_count": self.nulls}
+        if numeric:
+            out.update({
+                "mean": self.mean if self.count else None,
+                "std": self.std,
+                "min": self.min,
+                "max": self.max,
+            })
+        return out
+
+
+def _pick(fn, a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return fn(a, b)
+
+
+class DatasetStatsAccumulator:
+    """Single-pass row count, schema and per-column moments; feed it record batches."""
+
+    def __init__(self):
+        self.schema: pa.Schema | None = None
+        self.row_count = 0
+        self.columns: Dict[str, ColumnMoments] = {}
+
+    def update(self, batch: pa.RecordBatch) -> None:
+        if self.schema is None:
+            self.schema = batch.schema
+        self.row_count += batch.num_rows
+        for name, array in zip(batch.schema.names, batch.columns):
+            part = ColumnMoments.from_array(array, is_numeric(array.type))
+            self.columns[name] = self.columns[name].merge(part) if name in self.columns else part
+
+    def consume(self, batches: Iterable[pa.RecordBatch]) -> "DatasetStatsAccumulator":
+        for batch in batches:
+            self.update(batch)
+        return self
+
+    def result(self) -> Dict[str, Any]:
+        fields = list(self.schema) if self.schema is not None else []
+        return {
+            "row_count": self.row_count,
+            "schema": [{"name": f.name, "type": str(f.type)} for f in fields],
+            "columns": {
+                f.name: {"numeric": is_numeric(f.type), **self.columns.get(f.name, ColumnMoments()).as_dict(is_numeric(f.type))}
+                for f in fields
+            },
+        }
+
+
+class CoMomentAccumulator:
+    """Pairwise-complete co-moment matrices for Pearson correlation.
+
+    Each pair of columns keeps its own count, means and centered sums over the
+    rows where both values are present, which is what ``DataFrame.corr`` uses.
+    """
+
+    def __init__(self, columns: List[str]):
+        k = len(columns)
+        self.columns = columns
+        self.n = np.zeros((k, k))
+        self.mean_x = np.zeros((k, k))
+        self.mean_y = np.zeros((k, k))
+        self.m2_x = np.zeros((k, k))
+        self.m2_y = np.zeros((k, k))
+        self.c_xy = np.zeros((k, k))
+
+    def update(self, batch: pa.RecordBatch) -> None:
+        x = np.column_stack([
+            pc.cast(batch.column(name), pa.float64()).to_numpy(zero_copy_only=False)
+            for name in self.columns
+        ]) if self.columns else np.empty((batch.num_rows, 0))
+        valid = ~np.isnan(x)
+        if not valid.any():
+            return
+        # Center on the batch column means before forming products to limit cancellation.
+        with np.errstate(invalid="ignore"):
+            shift = np.where(valid.any(axis=0), np.nanmean(np.where(valid, x, np.nan), axis=0), 0.0)
+        m = valid.astype(np.float64)
+        x0 = np.where(valid, x - shift, 0.0)
+
+        n = m.T @ m
+        sx = x0.T @ m
+        sxx = (x0 * x0).T @ m
+        sxy = x0.T @ x0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mx = np.where(n > 0, sx / n, 0.0)
+            my = mx.T
+        m2x = np.where(n > 0, sxx - n * mx * mx, 0.0)
+        c_xy = np.where(n > 0, sxy - n * mx * my, 0.0)
+        self._merge(n, mx + shift[:, None], my + shift[None, :], m2x, m2x.T, c_xy)
+
+    def _merge(self, n_b, mx_b, my_b, m2x_b, m2y_b, c_b) -> None:
+        n_a = self.n
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = np.where(n > 0, n_a * n_b / n, 0.0)
+            frac_b = np.where(n > 0, n_b / n, 0.0)
+        dx = mx_b - self.mean_x
+        dy = my_b - self.mean_y
+        self.mean_x = self.mean_x + dx * frac_b
+        self.mean_y = self.mean_y + dy * frac_b
+        self.m2_x = self.m2_x + m2x_b + dx * dx * w
+        self.m2_y = self.m2_y + m2y_b + dy * dy * w
+        self.c_xy = self.c_xy + c_b + dx * dy * w
+        self.n = n
+
+    def consume(self, batches: Iterable[pa.RecordBatch]) -> "CoMomentAccumulator":
+        for batch in batches:
+            self.update(batch)
+        return self
+
+    def correlation(self) -> Dict[str, Dict[str, float]]:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            denom = np.sqrt(self.m2_x * self.m2_y)
+            corr = np.where((self.n > 0) & (denom > 0), self.c_xy / denom, np.nan)
+        corr = np.clip(corr, -1.0, 1.0)
+        return {
+            c: {c2: float(corr[j, i]) for j, c2 in enumerate(self.columns)}
+            for i, c in enumerate(self.columns)
+        }
+
+
+class TrendAccumulator:
+    """Per-period row counts and per-column count/sum/min/max, merged across batches."""
+
+    def __init__(self, date_col: str, value_cols: List[str], freq: str, aggs: List[str]):
+        self.date_col = date_col
+        self.value_cols = value_cols
+        self.freq = freq
+        self.aggs = aggs
+        self.spec = {"rows": "sum"}
+        for name in value_cols:
+            self.spec.update({f"{name}\0count": "sum", f"{name}\0sum": "sum",
+                              f"{name}\0min": "min", f"{name}\0max": "max"})
+        self.part: pd.DataFrame | None = None
+        self.first: pd.Timestamp | None = None
+        self.last: pd.Timestamp | None = None
+
+    def update(self, batch: pa.RecordBatch) -> None:
+        dates = parse_dates(batch.column(self.date_col).to_pandas())
+        keep = dates.notna()
+        if not keep.any():
+            return
+        first, last = dates[keep].min(), dates[keep].max()
+        self.first = first if self.first is None else min(self.first, first)
+        self.last = last if self.last is None else max(self.last, last)
+        check_period_count(self.first, self.last, self.freq)
+        frame = {"rows": np.ones(int(keep.sum()), dtype=np.int64)}
+        for name in self.value_cols:
+            x = pc.cast(batch.column(name), pa.float64()).to_numpy(zero_copy_only=False)[keep]
+            valid = ~np.isnan(x)
+            frame[f"{name}\0count"] = valid.astype(np.int64)
+            frame[f"{name}\0sum"] = np.where(valid, x, 0.0)
+            frame[f"{name}\0min"] = x
+            frame[f"{name}\0max"] = x
+        part = resample(pd.DataFrame(frame, index=dates[keep]), self.freq).agg(self.spec)
+        self.part = part if self.part is None else pd.concat([self.part, part]).groupby(level=0).agg(self.spec)
+
+    def consume(self, batches: Iterable[pa.RecordBatch]) -> "TrendAccumulator":
+        for batch in batches:
+            self.update(batch)
+        return self
+
+    def result(self) -> Dict[str, Any]:
+        if self.part is None:
+            part = pd.DataFrame({name: np.zeros(0) for name in self.spec}, index=pd.DatetimeIndex([]))
+        else:
+            # Re-resampling the bin labels fills the empty periods between batches.
+            part = resample(self.part.sort_index(), self.freq).agg(self.spec)
+        values = {}
+        for name in self.value_cols:
+            counts = part[f"{name}\0count"]
+            sums = part[f"{name}\0sum"]
+            columns = {
+                "sum": sums,
+                "mean": (sums / counts).where(counts > 0),
+                "min": part[f"{name}\0min"],
+                "max": part[f"{name}\0max"],
+            }
+            values[name] = {agg: columns[agg].to_numpy() for agg in self.aggs if agg != "count"}
+        return trend_columns(part.index, part["rows"].to_numpy() if "count" in self.aggs else None, values)
+
+
+def correlation_columns(schema: pa.Schema, cols: List[str] | None = None) -> List[str]:
+    """Numeric columns ``services.compute_correlation`` would use for ``cols``."""
+    if cols:
+        missing = [c for c in cols if c not in schema.names]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+    return [c for c in (cols or schema.names) if is_numeric(schema.field(c).type)]
+
+
+def streaming_correlation(batches: Iterable[pa.RecordBatch], columns: List[str]) -> Dict[str, Dict[str, float]]:
+    """Constant-memory equivalent of ``services.compute_correlation``."""
+    if not columns:
+        return {}
+    return CoMomentAccumulator(columns).consume(batches).correlation()
+
+
+def streaming_trend(schema: pa.Schema, batches: Iterable[pa.RecordBatch],
+                    date_col: str, value_cols: List[str], freq: str, aggs: List[str]) -> Dict[str, Any]:
+    """Constant-memory equivalent of ``services.compute_trend`` for ``MERGEABLE_AGGS``."""
+    if date_col not in schema.names:
+        raise ValueError("Missing date column")
+    measures = [a for a in aggs if a != "count"]
+    if measures and (not value_cols or any(c not in schema.names for c in value_cols)):
+        raise ValueError("Missing value column for non-count agg")
+    if any(a not in MERGEABLE_AGGS for a in aggs):
+        raise ValueError("Invalid agg")
+    for name in value_cols if measures else []:
+        if not (is_numeric(schema.field(name).type) or pa.types.is_boolean(schema.field(name).type)):
+            raise ValueError(f"Value column {name!r} is not numeric")
+    return TrendAccumulator(date_col, value_cols if measures else [], freq, aggs).consume(batches).result()
@@ -1,14 +1,63 @@
 """Celery tasks for dataset processing."""
 from __future__ import annotations
 
+import logging
+
 from celery import shared_task
 
-from .webhooks import notify_nexus, publish_echo_event
+from .columnar import build_columnar_sidecar
+from .indexes import build_column_indexes
+from .jobs import run_dataset_job  # noqa: F401  (registers the task for autodiscovery)
+from .models import DataFile, DatasetStats, OutboxEvent, TrendRollup
+from .outbox import DATASET_UPLOADED, relay_events
+from .rollups import DailyRollupAccumulator
+from .streaming import DatasetStatsAccumulator
+from .webhooks import notify_nexus
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
 def process_dataset_upload(dataset_id: int) -> None:
-    """Post-upload processing: notify external services."""
-    notify_nexus(dataset_id, "uploaded")
-    publish_echo_event("axi.dataset.uploaded", {"id": dataset_id})
+    """Post-upload processing: build the columnar sidecar, statistics, rollups and indexes, notify external services."""
+    datafile = DataFile.objects.filter(pk=dataset_id).first()
+    if datafile is not None:
+        stats = DatasetStatsAccumulator()
+        rollups = DailyRollupAccumulator()
+        if build_columnar_sidecar(datafile, consumers=[stats.update, rollups.update]):
+            result = stats.result()
+            DatasetStats.store(datafile, result)
+            datafile.store_shape(result["row_count"], [f["name"] for f in result["schema"]])
+            for date_col, data in rollups.results().items():
+                TrendRollup.store(datafile, date_col, data)
+            build_column_indexes(datafile)
+    try:
+        notify_dataset_event.delay(dataset_id, "uploaded")
+    except Exception as e:
+        logger.warning(f"Nexus notification not enqueued - dataset_id: {dataset_id}, error: {e}")
+
+
+@shared_task(ignore_result=True)
+def notify_dataset_event(dataset_id: int, event_type: str) -> None:
+    """Deliver a dataset event to Nexus; its retries and backoff no longer hold up upload processing."""
+    notify_nexus(dataset_id, event_type)
+
+
+def dispatch_event(event: OutboxEvent) -> None:
+    """Enqueue the work an outbox event triggers."""
+    if event.topic == DATASET_UPLOADED:
+        process_dataset_upload.delay(event.payload["id"])
+
+
+@shared_task(ignore_result=True)
+def relay_outbox() -> None:
+    """Relay pending outbox events; scheduled by beat every ``DATASET_OUTBOX_RELAY_INTERVAL`` seconds."""
+    relay_events(handler=dispatch_event)
+
 
+def schedule_outbox_relay() -> None:
+    """Relay right away instead of at the next beat tick, which still covers a failure here."""
+    try:
+        relay_outbox.delay()
+    except Exception as e:
+        logger.warning(f"Outbox relay not scheduled, left to beat - error: {e}")
@@ -0,0 +1,127 @@
+"""Webhook client tests against a local stub HTTP server (no database needed).
+
+Run with ``python manage.py test apps.datasets``.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .webhooks import Delivery, WebhookClient, delivery_stats, notify_nexus, publish_echo_event
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "webhook-tests"}}
+
+
+class StubServer:
+    """Answers POSTs with the next status of ``statuses`` (the last one repeats) and records them."""
+
+    def __init__(self, statuses=(200,), headers=None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.requests = []
+        self.clients = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append((self.path, dict(self.headers), body))
+                stub.clients.add(self.client_address)
+                status = stub.statuses.pop(0) if len(stub.statuses) > 1 else stub.statuses[0]
+                self.send_response(status)
+                for name, value in stub.headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(CACHES=LOCMEM)
+class WebhookClientTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_ = WebhookClient(retries=3, backoff=0.001, max_backoff=0.01, pool_size=2)
+
+    def stub(self, *args, **kwargs) -> StubServer:
+        stub = StubServer(*args, **kwargs)
+        self.addCleanup(stub.close)
+        return stub
+
+    def test_reuses_keep_alive_connection(self):
+        stub = self.stub()
+        for i in range(5):
+            self.assertTrue(self.client_.send(Delivery("nexus", stub.url, {"n": i}, timeout=2)))
+        self.assertEqual(len(stub.requests), 5)
+        self.assertEqual(len(stub.clients), 1)
+
+    def test_retries_5xx_until_accepted(self):
+        stub = self.stub(statuses=(503, 502, 200))
+        self.assertTrue(self.client_.send(Delivery("nexus", stub.url, {}, timeout=2)))
+        stats = self.client_.stats()["nexus"]
+        self.assertEqual((stats["delivered"], stats["failed"], stats["attempts"], stats["retries"]), (1, 0, 3, 2))
+
+    def test_gives_up_after_bounded_retries(self):
+        stub = self.stub(statuses=(500,))
+        self.assertFalse(self.client_.send(Delivery("nexus", stub.url, {}, timeout=2)))
+        self.assertEqual(len(stub.requests), 4)
+        self.assertEqual(self.client_.stats()["nexus"]["last_error"], "HTTP 500")
+
+    def test_does_not_retry_client_errors(self):
+        stub = self.stub(statuses=(422,))
+        self.assertFalse(self.client_.send(Delivery("echo", stub.url, {}, timeout=2)))
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_retry_after_is_capped_by_max_backoff(self):
+        stub = self.stub(statuses=(429, 200), headers={"Retry-After": "120"})
+        self.assertTrue(self.client_.send(Delivery("echo", stub.url, {}, timeout=2)))
+        self.assertEqual(len(stub.requests), 2)
+
+    def test_connection_errors_are_counted_not_raised(self):
+        stub = self.stub()
+        url = stub.url
+        stub.close()
+        self.assertFalse(self.client_.send(Delivery("nexus", url, {}, timeout=1)))
+        self.assertEqual(self.client_.stats()["nexus"]["attempts"], 4)
+
+    def test_counters_are_shared_through_the_cache(self):
+        stub = self.stub(statuses=(200, 400))
+        other = WebhookClient(retries=0, backoff=0.001, max_backoff=0.01, pool_size=1)
+        self.client_.send(Delivery("echo", stub.url, {}, timeout=2))
+        other.send(Delivery("echo", stub.url, {}, timeout=2))
+        echo = delivery_stats()["echo"]
+        self.assertEqual((echo["delivered"], echo["failed"], echo["attempts"]), (1, 1, 2))
+        self.assertEqual(echo["last_error"], "HTTP 400")
+        self.assertEqual(delivery_stats()["nexus"]["delivered"], 0)
+
+    def test_publishers_target_configured_urls(self):
+        stub = self.stub()
+        with override_settings(NEXUS_WEBHOOK_URL=f"{stub.url}/nexus", ECHO_URL=stub.url):
+            self.assertTrue(notify_nexus(7, "uploaded"))
+            self.assertTrue(publish_echo_event("axi.dataset.uploaded", {"id": 7}, idempotency_key="k-7"))
+        (nexus_path, _, nexus_body), (echo_path, echo_headers, echo_body) = stub.requests
+        self.assertEqual((nexus_path, nexus_body), ("/nexus", {"dataset_id": 7, "event": "uploaded"}))
+        self.assertEqual((echo_path, echo_body), ("/events/publish/axi.dataset.uploaded", {"id": 7}))
+        self.assertEqual(echo_headers["Idempotency-Key"], "k-7")
+
+    def test_unconfigured_targets_are_skipped(self):
+        with override_settings(NEXUS_WEBHOOK_URL=None, ECHO_URL=None):
+            self.assertFalse(notify_nexus(1, "uploaded"))
+            self.assertFalse(publish_echo_event("axi.dataset.uploaded", {"id": 1}))
+        self.assertEqual(delivery_stats()["nexus"]["attempts"], 0)
@@ -1,13 +1,23 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
-    login_view, upload_view, health, data_preview, data_summary, data_rows,
+    login_view, upload_view, health, health_live, health_ready, data_preview, data_summary, data_rows,
     data_correlation, data_trend, get_download_url, bulk_upload_view,
     bulk_delete_view, cohort_analysis_view, health_integrations, nexus_webhook,
-    dataset_metrics,
+    dataset_metrics, data_export, create_job, job_detail,
 )
 
+if getattr(settings, "DATASET_ASYNC_VIEWS", False):
+    # Same paths and payloads, served by native async views (ASGI deployments).
+    from .async_views import (  # noqa: F811
+        data_preview, data_summary, data_correlation, data_trend, get_download_url,
+        health_integrations, dataset_metrics,
+    )
+
 urlpatterns = [
     path("health/", health, name="health"),
+    path("health/live", health_live, name="health_live"),
+    path("health/ready", health_ready, name="health_ready"),
     path("auth/login", login_view, name="login"),
     path("datasets/upload", upload_view, name="upload"),
     path("datasets/bulk-upload", bulk_upload_view, name="bulk_upload"),
@@ -15,10 +25,13 @@ urlpatterns = [
     path("datasets/<int:id>/preview", data_preview, name="data_preview"),
     path("datasets/<int:id>/summary", data_summary, name="data_summary"),
     path("datasets/<int:id>/rows", data_rows, name="data_rows"),
+    path("datasets/<int:id>/export", data_export, name="data_export"),
     path("datasets/<int:id>/correlation", data_correlation, name="data_correlation"),
     path("datasets/<int:id>/trend", data_trend, name="data_trend"),
     path("datasets/<int:id>/cohort-analysis", cohort_analysis_view, name="cohort_analysis"),
     path("datasets/<int:id>/download-url/", get_download_url, name="download_url"),
+    path("datasets/<int:id>/jobs", create_job, name="create_job"),
+    path("jobs/<str:job_id>", job_detail, name="job_detail"),
     path("health/integrations", health_integrations, name="health_integrations"),
     path("webhooks/nexus", nexus_webhook, name="nexus_webhook"),
     path("datasets/<int:id>/metrics", dataset_metrics, name="dataset_metrics"),
@@ -1,29 +1,47 @@
+import itertools
 import json
+import logging
+import os
 from django.contrib.auth import authenticate
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.db import transaction
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
+from django.urls import reverse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 from django.conf import settings
+from django.core.files.storage import default_storage
 from datetime import timedelta
 import pandas as pd
-import io
 
-from .models import Token, DataFile
+from .models import Token, DataFile, DatasetStats, OutboxEvent, TrendRollup
 from .permissions import IsOwnerOfDataFile
 from .services import (
     safe_read_csv, DataReadError,
-    select_columns, apply_filters, apply_sort, paginate,
-    compute_correlation, compute_trend
+    parse_sort, paginate_table, page_payload, trend_payload,
 )
-from .serializers import TrendParamsSerializer, RowsParamsSerializer, FileUploadSerializer
-from .tasks import process_dataset_upload
-from django.conf import settings
-import requests
+from .serializers import (
+    TrendParamsSerializer, CohortParamsSerializer, RowsParamsSerializer, ExportParamsSerializer, FileUploadSerializer, JobRequestSerializer,
+)
+from .outbox import DATASET_UPLOADED
+from .tasks import schedule_outbox_relay
+from .loaders import dataset_columns, dataset_shape, cached_head, scan_table
+from .cache import table_cache, sort_cache, cache_key
+from .compute import compute_pool, job_cost, summary_result, correlation_result, trend_result, cohort_result
+from .renderers import TABLE_RENDERERS, CSVRenderer, ParquetRenderer, TableRenderer, records_json
+from .export import export_batches, export_schema
+from .health import integration_health, readiness
+from .jobs import job_status, normalize_params, submit_job
+from .preview import forget_preview, read_preview
+from .rollups import rollup_covers, rollup_trend
+
+logger = logging.getLogger(__name__)
 
 
 def _json_error(message: str, status: int = 400):
@@ -49,6 +67,21 @@ def login_view(request):
     return JsonResponse({"token": token.key})
 
 
+def _summary(stats) -> dict:
+    # Iterate the schema list: JSON object key order is not preserved by jsonb.
+    columns = [(f["name"], stats.columns[f["name"]]) for f in stats.schema]
+    return {
+        col: {"count": float(s["count"]), "mean": s["mean"], "std": s["std"]}
+        for col, s in columns if s.get("numeric")
+    }
+
+
+def _trend_error(value_cols, aggs) -> str | None:
+    if aggs != ["count"] and not value_cols:
+        return "Missing 'value' parameter for agg != count"
+    return None
+
+
 def _parse_filters(request):
     raw = request.query_params.getlist("f")
     out = []
@@ -60,27 +93,31 @@ def _parse_filters(request):
     return out
 
 
+@require_GET
+def health_live(request):
+    """Liveness: the process serves requests. No database, storage or network I/O."""
+    return JsonResponse({"status": "ok"})
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def health_ready(request):
+    result = readiness.check()
+    return Response(result, status=200 if result["status"] == "ok" else 503)
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def health(request):
-    try:
-        from django.db import connection
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-        db_status = "ok"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
-    try:
-        from django.core.files.storage import default_storage
-        default_storage.listdir('.')
-        storage_status = "ok"
-    except Exception as e:
-        storage_status = f"error: {str(e)}"
-    return Response({
-        "status": "ok" if db_status == "ok" and storage_status == "ok" else "degraded",
-        "database": db_status,
-        "storage": storage_status
-    })
+    return Response(readiness.check())
+
+
+def _create_datafile(file, user) -> DataFile:
+    """Store the upload and its outbox event atomically: processing can no longer be lost with the broker."""
+    with transaction.atomic():
+        datafile = DataFile.objects.create(file=file, uploaded_by=user)
+        OutboxEvent.record(DATASET_UPLOADED, {"id": datafile.id})
+    return datafile
 
 
 @api_view(["POST"])
@@ -89,33 +126,15 @@ def upload_view(request):
     serializer = FileUploadSerializer(data=request.data)
     if not serializer.is_valid():
         return Response({"error": {"code": "bad_request", "message": serializer.errors}}, status=400)
-    datafile = DataFile.objects.create(file=serializer.validated_data["file"], uploaded_by=request.user)
-    # Fire-and-forget background processing
-    try:
-        process_dataset_upload.delay(datafile.id)
-    except Exception:
-        pass
+    datafile = _create_datafile(serializer.validated_data["file"], request.user)
+    transaction.on_commit(schedule_outbox_relay)
     return Response({"message": "File uploaded successfully", "id": datafile.id})
 
 
 @api_view(["GET"])  # Simple integrations health
 @permission_classes([AllowAny])
 def health_integrations(request):
-    def check(url: str | None, timeout: int = 2):
-        if not url:
-            return {"status": "unknown"}
-        try:
-            r = requests.get(url, timeout=timeout)
-            return {"status": "ok" if r.status_code < 500 else "degraded", "code": r.status_code}
-        except Exception as e:
-            return {"status": "error", "error": str(e)}
-
-    out = {
-        "nexus": check(getattr(settings, "NEXUS_WEBHOOK_URL", None)),
-        "echo": check(getattr(settings, "ECHO_URL", None)),
-        "aide": check(getattr(settings, "AIDE_URL", None)),
-    }
-    return Response(out)
+    return Response(integration_health.check())
 
 
 @api_view(["POST"])  # Nexus webhook receiver (portfolio-safe)
@@ -132,18 +151,21 @@ def nexus_webhook(request):
 @permission_classes([IsAuthenticated, IsOwnerOfDataFile])
 def dataset_metrics(request, id: int):
     datafile = get_object_or_404(DataFile, pk=id)
-    try:
-        with datafile.file.open('r') as f:
-            df = pd.read_csv(f, dtype_backend="pyarrow")
-    except Exception as e:
-        return Response({"error": {"code": "bad_request", "message": str(e)}}, status=400)
+    if datafile.row_count is not None and datafile.column_names is not None:
+        row_count, schema = datafile.row_count, datafile.column_names
+    else:
+        try:
+            row_count, schema = dataset_shape(datafile)
+        except Exception as e:
+            return Response({"error": {"code": "bad_request", "message": str(e)}}, status=400)
+        datafile.store_shape(int(row_count), schema)
 
     metrics = {
-        "rows": int(len(df)),
-        "columns": int(len(df.columns)),
-        "size_bytes": datafile.file.size if hasattr(datafile.file, 'size') else None,
+        "rows": int(row_count),
+        "columns": int(len(schema)),
+        "size_bytes": datafile.file_size if datafile.file_size is not None else datafile.file.size,
         "created_at": datafile.created_at,
-        "schema": list(map(str, df.columns.tolist())),
+        "schema": schema,
     }
     return Response({"id": datafile.id, "metrics": metrics})
 
@@ -153,8 +175,9 @@ def dataset_metrics(request, id: int):
 def data_preview(request, id: int):
     datafile = get_object_or_404(DataFile, pk=id)
     try:
-        with datafile.file.open('r') as f:
-            df = pd.read_csv(f, nrows=5, dtype_backend="pyarrow")
+        df = cached_head(datafile, 5)
+        if df is None:
+            df = read_preview(datafile, 5)
     except pd.errors.EmptyDataError:
         return Response({"error": {"code":"bad_request","message": "Empty file"}}, status=400)
     except pd.errors.ParserError:
@@ -167,56 +190,95 @@ def data_preview(request, id: int):
 @permission_classes([IsAuthenticated, IsOwnerOfDataFile])
 def data_summary(request, id: int):
     datafile = get_object_or_404(DataFile, pk=id)
-    try:
-        with datafile.file.open('r') as f:
-            df = pd.read_csv(f, dtype_backend="pyarrow")
-    except Exception as e:
-        return Response({"error": {"code":"bad_request","message": str(e)}}, status=400)
-    numeric_df = df.select_dtypes(include=["number"])
-    if numeric_df.empty:
-        return Response({"id": datafile.id, "summary": {}})
-    desc = numeric_df.describe()
-    subset = desc.loc[["count", "mean", "std"]].to_dict()
-    summary = {col: {k: (float(v) if v is not None else None) for k, v in stats.items()} for col, stats in subset.items()}
-    return Response({"id": datafile.id, "summary": summary})
+    stats = DatasetStats.fresh_for(datafile)
+    if stats is None:
+        try:
+            result = compute_pool.run(summary_result, datafile, cost=job_cost(datafile))
+        except APIException:
+            raise
+        except Exception as e:
+            return Response({"error": {"code":"bad_request","message": str(e)}}, status=400)
+        stats = DatasetStats.store(datafile, result)
+    return Response({"id": datafile.id, "summary": _summary(stats)})
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsOwnerOfDataFile])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, *TABLE_RENDERERS])
 def data_rows(request, id: int):
     datafile = get_object_or_404(DataFile, pk=id)
-    try:
-        with datafile.file.open('r') as f:
-            df = pd.read_csv(f, dtype_backend="pyarrow")
-    except Exception as e:
-        return Response({"error": {"code":"bad_request","message": str(e)}}, status=400)
     params = RowsParamsSerializer(data=request.query_params)
     params.is_valid(raise_exception=True)
     columns = params.validated_data.get("columns")
     columns = [c.strip() for c in columns.split(",")] if columns else None
     filters = _parse_filters(request)
-    df = apply_filters(df, filters)
-    df = select_columns(df, columns)
-    df = apply_sort(df, params.validated_data.get("sort"))
-    payload = paginate(df.to_dict(orient="records"), params.validated_data["page"], params.validated_data["page_size"])
-    return Response(payload)
+    sort_expr = params.validated_data.get("sort")
+    needed = columns + [col for col, _, _ in filters] + [f for f, _ in parse_sort(sort_expr)] if columns else None
+    try:
+        table = scan_table(datafile, needed, filters)
+    except Exception as e:
+        return Response({"error": {"code":"bad_request","message": str(e)}}, status=400)
+    try:
+        page_table, meta = paginate_table(
+            table, params.validated_data["page"], params.validated_data["page_size"],
+            sort_expr=sort_expr, cursor=params.validated_data.get("cursor"), columns=columns,
+            order_cache=sort_cache, order_key=(cache_key(datafile), tuple(filters), sort_expr))
+    except ValueError as ve:
+        return Response({"error": {"code":"bad_request","message": str(ve)}}, status=400)
+    if isinstance(request.accepted_renderer, TableRenderer):
+        # Binary and line formats carry the pagination metadata in headers.
+        headers = {
+            "X-Page": str(meta["page"]),
+            "X-Page-Size": str(meta["page_size"]),
+            "X-Total-Count": str(meta["total"]),
+        }
+        if meta["next_cursor"]:
+            headers["X-Next-Cursor"] = meta["next_cursor"]
+        return Response(page_table, headers=headers)
+    return Response(page_payload(meta, records_json(page_table)))
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsOwnerOfDataFile])
-def data_correlation(request, id: int):
+@renderer_classes([CSVRenderer, ParquetRenderer])
+def data_export(request, id: int):
     datafile = get_object_or_404(DataFile, pk=id)
+    params = ExportParamsSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    columns = params.validated_data.get("columns")
+    columns = [c.strip() for c in columns.split(",")] if columns else None
+    filters = _parse_filters(request)
+    sort_expr = params.validated_data.get("sort")
     try:
-        with datafile.file.open('r') as f:
-            df = pd.read_csv(f, dtype_backend="pyarrow")
+        schema = export_schema(datafile, columns, sort_expr, filters)
+        batches = export_batches(datafile, columns, filters, sort_expr)
+        # The first batch only comes once the filters ran on every row, so casts
+        # that fail on the data are a 400 before any byte is sent.
+        first = next(batches, None)
     except Exception as e:
         return Response({"error": {"code":"bad_request","message": str(e)}}, status=400)
+    renderer = request.accepted_renderer
+    response = StreamingHttpResponse(
+        renderer.stream(schema, itertools.chain([first] if first is not None else [], batches)),
+        content_type=renderer.media_type if renderer.charset is None else f"{renderer.media_type}; charset={renderer.charset}",
+    )
+    name = os.path.splitext(os.path.basename(datafile.original_filename or datafile.file.name))[0]
+    response["Content-Disposition"] = f'attachment; filename="{name}.{renderer.format}"'
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsOwnerOfDataFile])
+def data_correlation(request, id: int):
+    datafile = get_object_or_404(DataFile, pk=id)
     cols = request.query_params.get("cols")
     cols = [c.strip() for c in cols.split(",")] if cols else None
     try:
-        corr = compute_correlation(df, cols)
-    except ValueError as ve:
-        return Response({"error": {"code":"bad_request","message": str(ve)}}, status=400)
+        corr = compute_pool.run(correlation_result, datafile, cols, cost=job_cost(datafile))
+    except APIException:
+        raise
+    except Exception as e:
+        return Response({"error": {"code":"bad_request","message": str(e)}}, status=400)
     return Response({"id": datafile.id, "correlation": corr})
 
 
@@ -224,28 +286,52 @@ def data_correlation(request, id: int):
 @permission_classes([IsAuthenticated, IsOwnerOfDataFile])
 def data_trend(request, id: int):
     datafile = get_object_or_404(DataFile, pk=id)
-    try:
-        with datafile.file.open('r') as f:
-            df = pd.read_csv(f, dtype_backend="pyarrow")
-    except Exception as e:
-        return _json_error(str(e), status=400)
     params = TrendParamsSerializer(data=request.query_params)
     params.is_valid(raise_exception=True)
     date_col = params.validated_data['date']
-    value_col = params.validated_data.get('value')
+    value_cols = params.validated_data.get('value') or []
     freq = params.validated_data['freq']
-    agg = params.validated_data['agg']
-    if agg != "count" and not value_col:
-        return _json_error("Missing 'value' parameter for agg != count", status=400)
-    if freq not in {"D", "W", "M"}:
-        return _json_error("Invalid freq (use D, W, or M)", status=400)
-    if agg not in {"sum", "mean", "count"}:
-        return _json_error("Invalid agg (use sum, mean, or count)", status=400)
+    aggs = params.validated_data['agg']
+    error = _trend_error(value_cols, aggs)
+    if error:
+        return _json_error(error, status=400)
+    rollup = TrendRollup.fresh_for(datafile, date_col)
+    if rollup is not None and rollup_covers(rollup.data, value_cols, freq, aggs):
+        try:
+            out = rollup_trend(rollup.data, value_cols, freq, aggs)
+        except ValueError as e:
+            return _json_error(str(e), status=400)
+        return JsonResponse({"id": datafile.id, "trend": trend_payload(out, value_cols, aggs)})
     try:
-        out = compute_trend(df, date_col=date_col, value_col=(value_col or date_col), freq=freq, agg=agg)
-    except ValueError as ve:
-        return _json_error(str(ve), status=400)
-    return JsonResponse({"id": datafile.id, "trend": out})
+        out = compute_pool.run(trend_result, datafile, date_col, value_cols, freq, aggs, cost=job_cost(datafile))
+    except APIException:
+        raise
+    except Exception as e:
+        return _json_error(str(e), status=400)
+    return JsonResponse({"id": datafile.id, "trend": trend_payload(out, value_cols, aggs)})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsOwnerOfDataFile])
+def create_job(request, id: int):
+    datafile = get_object_or_404(DataFile, pk=id)
+    serializer = JobRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    job_type = serializer.validated_data["type"]
+    params = normalize_params(job_type, serializer.validated_data["params"])
+    job = submit_job(datafile, job_type, params)
+    headers = {"Location": request.build_absolute_uri(reverse("job_detail", args=[job["job_id"]]))}
+    return Response(job, status=202 if job["status"] in ("queued", "running") else 200, headers=headers)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsOwnerOfDataFile])
+def job_detail(request, job_id: str):
+    job = job_status(job_id)
+    if job is None:
+        return Response({"error": {"code": "not_found", "message": "Job not found"}}, status=404)
+    get_object_or_404(DataFile, pk=job["dataset_id"])
+    return Response(job)
 
 
 @api_view(["GET"])   
@@ -273,10 +359,12 @@ def bulk_upload_view(request):
             results.append({"filename": file.name, "status": "error", "message": "Only CSV files allowed"})
             continue
         try:
-            datafile = DataFile.objects.create(file=file, uploaded_by=request.user)
+            datafile = _create_datafile(file, request.user)
             results.append({"filename": file.name, "status": "success", "id": datafile.id})
         except Exception as e:
             results.append({"filename": file.name, "status": "error", "message": str(e)})
+    if any(r["status"] == "success" for r in results):
+        transaction.on_commit(schedule_outbox_relay)
     return Response({"results": results})
 
 
@@ -286,9 +374,23 @@ def bulk_delete_view(request):
     ids = request.data.get('ids', [])
     if not ids or not isinstance(ids, list):
         return Response({"error": {"code": "bad_request", "message": "Missing or invalid 'ids' array"}}, status=400)
-    user_files = DataFile.objects.filter(id__in=ids, uploaded_by=request.user)
-    deleted_count = user_files.count()
+    user_files = DataFile.objects.filter(id__in=ids, uploaded_by=request.user).prefetch_related("indexes")
+    stored = {datafile.id: datafile.stored_files() for datafile in user_files}
+    deleted_ids = list(stored)
+    deleted_count = len(deleted_ids)
     user_files.delete()
+    for dataset_id, names in stored.items():
+        for name in names:
+            try:
+                default_storage.delete(name)
+            except Exception as e:
+                logger.warning(f"Stored file not deleted - dataset_id: {dataset_id}, name: {name}, error: {e}")
+        # Only this process's caches are cleared. Entries held by other workers are
+        # keyed by (id, file_size, created_at), so they can never be served for a
+        # later upload; they only cost memory until evicted.
+        table_cache.invalidate(dataset_id)
+        sort_cache.invalidate(dataset_id)
+        forget_preview(dataset_id)
     return Response({"message": f"Deleted {deleted_count} datasets", "deleted_ids": list(ids[:deleted_count])})
 
 
@@ -297,21 +399,18 @@ def bulk_delete_view(request):
 def cohort_analysis_view(request, id):
     try:
         dataset = DataFile.objects.get(id=id, uploaded_by=request.user)
-        dataset.file.seek(0)
-        file_content = dataset.file.read()
-        df = pd.read_csv(io.BytesIO(file_content))
+        available = dataset_columns(dataset)
         required_cols = ['user_id', 'registration_date', 'activity_date']
-        missing_cols = [col for col in required_cols if col not in df.columns]
+        missing_cols = [col for col in required_cols if col not in available]
         if missing_cols:
             return Response({
                 "error": f"Missing required columns: {missing_cols}",
                 "required": required_cols,
-                "available": list(df.columns)
+                "available": available
             }, status=400)
-        result = {
-            "cohorts": {},
-            "retention": {}
-        }
+        params = CohortParamsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        result = compute_pool.run(cohort_result, dataset, params.validated_data["freq"], cost=job_cost(dataset))
         return Response({
             "dataset_id": id,
             "analysis_type": "cohort_retention",
@@ -319,6 +418,8 @@ def cohort_analysis_view(request, id):
         })
     except DataFile.DoesNotExist:
         return Response({"error": "Dataset not found"}, status=404)
+    except APIException:
+        raise
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
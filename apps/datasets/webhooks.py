@@ -1,31 +1,253 @@
-"""Webhook publishers for external integrations (Nexus, Echo)."""
+"""Webhook publishers for external integrations (Nexus, Echo).
+
+Deliveries go through one ``WebhookClient`` per process: a ``requests.Session``
+keeping a pool of keep-alive connections per host, and bounded retries with
+exponential backoff and full jitter on connection errors, timeouts, 429 and 5xx.
+Failures are logged and counted but never raised: notifications stay off the
+critical path. Echo events are published by the outbox relay (``outbox.py``).
+
+Delivery counters are kept per process (``WebhookClient.stats``) and added up
+in the Django cache, so ``delivery_stats()`` reports every worker's deliveries
+(shown by ``/health/integrations`` and ``relay_outbox --stats``).
+"""
 from __future__ import annotations
 
-from django.conf import settings
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
 import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 
+logger = logging.getLogger(__name__)
 
-def notify_nexus(dataset_id: int, event_type: str) -> None:
-    """Send dataset event to Nexus webhook."""
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 10.0
+DEFAULT_POOL_SIZE = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+TARGETS = ("nexus", "echo")
+SHARED_COUNTERS = ("delivered", "failed", "attempts", "retries", "latency_ms")
+
+
+@dataclass
+class Delivery:
+    target: str
+    url: str
+    payload: Any
+    timeout: float
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class TargetStats:
+    delivered: int = 0
+    failed: int = 0
+    attempts: int = 0
+    retries: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    last_error: str | None = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = self.delivered + self.failed
+        return {
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "latency_avg_ms": round(1000 * self.latency_total / done, 1) if done else None,
+            "latency_max_ms": round(1000 * self.latency_max, 1),
+            "last_error": self.last_error,
+        }
+
+
+@dataclass
+class _Outcome:
+    ok: bool
+    retry: bool
+    error: str | None = None
+    wait: float | None = None
+
+
+class WebhookClient:
+    """Pooled, retrying JSON POST client with per-target counters."""
+
+    def __init__(self, retries: int, backoff: float, max_backoff: float, pool_size: int):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._session: requests.Session | None = None
+        self._stats: Dict[str, TargetStats] = {}
+
+    def _get_session(self) -> requests.Session:
+        with self._lock:
+            # Prefork Celery workers import this module before forking: sockets are
+            # created in the process that uses them.
+            if self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def _attempt(self, session: requests.Session, delivery: Delivery) -> _Outcome:
+        try:
+            r = session.post(delivery.url, json=delivery.payload, headers=delivery.headers, timeout=delivery.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            return _Outcome(ok=False, retry=True, error=f"{type(e).__name__}: {e}")
+        except requests.RequestException as e:
+            return _Outcome(ok=False, retry=False, error=f"{type(e).__name__}: {e}")
+        if r.status_code < 400:
+            return _Outcome(ok=True, retry=False)
+        wait = r.headers.get("Retry-After")
+        return _Outcome(
+            ok=False,
+            retry=r.status_code in RETRY_STATUSES,
+            error=f"HTTP {r.status_code}",
+            wait=float(wait) if wait and wait.isdigit() else None,
+        )
+
+    def _delay(self, attempt: int, hint: float | None) -> float:
+        if hint is not None:
+            return min(hint, self.max_backoff)
+        # Full jitter: spreads the retries of many workers hitting the same outage.
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def send(self, delivery: Delivery) -> bool:
+        """POST ``delivery`` with retries; True once the target accepted it."""
+        session = self._get_session()
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            outcome = self._attempt(session, delivery)
+            if outcome.ok or not outcome.retry or attempt >= self.retries:
+                break
+            time.sleep(self._delay(attempt, outcome.wait))
+            attempt += 1
+        self._record(delivery.target, outcome, attempt, time.perf_counter() - started)
+        if not outcome.ok:
+            logger.warning(f"Webhook delivery failed - target: {delivery.target}, attempts: {attempt + 1}, "
+                           f"error: {outcome.error}")
+        return outcome.ok
+
+    def _record(self, target: str, outcome: _Outcome, retries: int, elapsed: float) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(target, TargetStats())
+            stats.attempts += retries + 1
+            stats.retries += retries
+            stats.latency_total += elapsed
+            stats.latency_max = max(stats.latency_max, elapsed)
+            if outcome.ok:
+                stats.delivered += 1
+            else:
+                stats.failed += 1
+                stats.last_error = outcome.error
+        _share(target, outcome, retries, elapsed)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {target: s.as_dict() for target, s in self._stats.items()}
+
+
+def _counter_key(target: str, name: str) -> str:
+    return f"datasets:webhooks:{target}:{name}"
+
+
+def _share(target: str, outcome: _Outcome, retries: int, elapsed: float) -> None:
+    counts = {
+        "delivered" if outcome.ok else "failed": 1,
+        "attempts": retries + 1,
+        "retries": retries,
+        "latency_ms": round(1000 * elapsed),
+    }
+    try:
+        for name, n in counts.items():
+            if n:
+                key = _counter_key(target, name)
+                cache.add(key, 0, None)
+                cache.incr(key, n)
+        if not outcome.ok:
+            cache.set(_counter_key(target, "last_error"), outcome.error, None)
+    except Exception as e:
+        # Counters are best effort: the delivery itself already happened.
+        logger.debug(f"Webhook counters not updated - target: {target}, error: {e}")
+
+
+def delivery_stats() -> Dict[str, Dict[str, Any]]:
+    """Delivery counters of every process, per target, since the cache was last flushed."""
+    keys = [_counter_key(t, name) for t in TARGETS for name in (*SHARED_COUNTERS, "last_error")]
+    try:
+        values = cache.get_many(keys)
+    except Exception as e:
+        logger.warning(f"Webhook counters unavailable - error: {e}")
+        return {}
+    out = {}
+    for target in TARGETS:
+        counts = {name: values.get(_counter_key(target, name), 0) for name in SHARED_COUNTERS}
+        done = counts["delivered"] + counts["failed"]
+        out[target] = {
+            "delivered": counts["delivered"],
+            "failed": counts["failed"],
+            "attempts": counts["attempts"],
+            "retries": counts["retries"],
+            "latency_avg_ms": round(counts["latency_ms"] / done, 1) if done else None,
+            "last_error": values.get(_counter_key(target, "last_error")),
+        }
+    return out
+
+
+webhook_client = WebhookClient(
+    retries=getattr(settings, "DATASET_WEBHOOK_RETRIES", DEFAULT_RETRIES),
+    backoff=getattr(settings, "DATASET_WEBHOOK_BACKOFF", DEFAULT_BACKOFF),
+    max_backoff=getattr(settings, "DATASET_WEBHOOK_MAX_BACKOFF", DEFAULT_MAX_BACKOFF),
+    pool_size=getattr(settings, "DATASET_WEBHOOK_POOL_SIZE", DEFAULT_POOL_SIZE),
+)
+
+
+def nexus_delivery(dataset_id: int, event_type: str) -> Delivery | None:
     url = getattr(settings, "NEXUS_WEBHOOK_URL", None)
     if not url:
-        return
-    payload = {"dataset_id": dataset_id, "event": event_type}
-    try:
-        requests.post(url, json=payload, timeout=5)
-    except Exception:
-        # Intentionally swallow exceptions (non-critical path)
-        pass
+        return None
+    return Delivery("nexus", url, {"dataset_id": dataset_id, "event": event_type}, timeout=5)
 
 
-def publish_echo_event(event_name: str, data: dict) -> None:
-    """Publish an event to Echo event bus."""
+def echo_delivery(event_name: str, data: dict, idempotency_key: str | None = None) -> Delivery | None:
     base = getattr(settings, "ECHO_URL", None)
     if not base:
-        return
-    try:
-        requests.post(f"{base}/events/publish/{event_name}", json=data, timeout=3)
-    except Exception:
-        # Intentionally swallow exceptions (non-critical path)
-        pass
+        return None
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+    return Delivery("echo", f"{base}/events/publish/{event_name}", data, timeout=3, headers=headers)
+
+
+def notify_nexus(dataset_id: int, event_type: str) -> bool:
+    """Send dataset event to Nexus webhook."""
+    delivery = nexus_delivery(dataset_id, event_type)
+    return delivery is not None and webhook_client.send(delivery)
+
 
+def publish_echo_event(event_name: str, data: dict, idempotency_key: str | None = None) -> bool:
+    """Publish an event to Echo event bus."""
+    delivery = echo_delivery(event_name, data, idempotency_key)
+    return delivery is not None and webhook_client.send(delivery)
+
+
+def publish_echo_batch(events: List[Dict[str, Any]], idempotency_key: str) -> bool:
+    """Publish several events to Echo in one request (``DATASET_OUTBOX_ECHO_BATCH``); also True when Echo is not configured."""
+    base = getattr(settings, "ECHO_URL", None)
+    if not base:
+        return True
+    delivery = Delivery("echo", f"{base}/events/publish", {"events": events}, timeout=10,
+                        headers={"Idempotency-Key": idempotency_key})
+    return webhook_client.send(delivery)
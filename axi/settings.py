@@ -180,10 +180,19 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "apps.datasets.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "EXCEPTION_HANDLER": "apps.datasets.errors.custom_exception_handler",
 }
 
+# Tokens OAuth2 validados: entradas de la caché en proceso y segundos máximos que un proceso
+# reutiliza su copia (la caché compartida y la propia se invalidan al revocar/borrar el token)
+OAUTH_TOKEN_CACHE_SIZE = int(os.getenv("OAUTH_TOKEN_CACHE_SIZE", 10000))
+OAUTH_TOKEN_LOCAL_TTL = float(os.getenv("OAUTH_TOKEN_LOCAL_TTL", 30))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv("JWT_ACCESS_TOKEN_LIFETIME", 60))),
     'REFRESH_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv("JWT_REFRESH_TOKEN_LIFETIME", 1440))),
@@ -233,6 +242,91 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Vida de los resultados de trabajos analíticos (/datasets/<id>/jobs) en el backend de resultados
+DATASET_JOB_RESULT_TTL = int(os.getenv("DATASET_JOB_RESULT_TTL", 24 * 60 * 60))
+CELERY_RESULT_EXPIRES = DATASET_JOB_RESULT_TTL
+# Outbox de eventos: filas reclamadas por lote, intervalo del relay y días de retención
+DATASET_OUTBOX_BATCH_SIZE = int(os.getenv("DATASET_OUTBOX_BATCH_SIZE", 100))
+# Publicar cada lote en Echo con una sola petición (POST /events/publish) en lugar de una por evento
+DATASET_OUTBOX_ECHO_BATCH = os.getenv("DATASET_OUTBOX_ECHO_BATCH", "false").lower() == "true"
+# Intentos rechazados por Echo antes de apartar un evento (outbox_stats "failed")
+DATASET_OUTBOX_MAX_ATTEMPTS = int(os.getenv("DATASET_OUTBOX_MAX_ATTEMPTS", 10))
+DATASET_OUTBOX_RELAY_INTERVAL = float(os.getenv("DATASET_OUTBOX_RELAY_INTERVAL", 10))
+DATASET_OUTBOX_RETENTION_DAYS = int(os.getenv("DATASET_OUTBOX_RETENTION_DAYS", 7))
+# Tareas periódicas (celery -A axi beat)
+CELERY_BEAT_SCHEDULE = {
+    "relay-outbox": {
+        "task": "apps.datasets.tasks.relay_outbox",
+        "schedule": DATASET_OUTBOX_RELAY_INTERVAL,
+    },
+}
+
+# ============================================================================
+# CONFIGURACIÓN CACHÉ
+# ============================================================================
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+if CACHE_REDIS_URL:
+    # Compartida entre workers (previews, etc.)
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    }
+else:
+    # Local: caché en memoria por proceso
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# ============================================================================
+# CONFIGURACIÓN DATASETS (RENDIMIENTO)
+# ============================================================================
+# Presupuesto en bytes (buffers Arrow) de la caché de tablas por worker
+DATASET_CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Presupuesto de la caché de permutaciones de orden (sort=) repetidas
+DATASET_SORT_CACHE_MAX_BYTES = int(os.getenv("DATASET_SORT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Columnas con índice secundario (eq/in/rangos en /rows), separadas por comas
+DATASET_INDEX_COLUMNS = [c.strip() for c in os.getenv("DATASET_INDEX_COLUMNS", "").split(",") if c.strip()]
+# Columnas de texto con índice de trigramas (filtro contains en /rows), separadas por comas
+DATASET_TRIGRAM_COLUMNS = [c.strip() for c in os.getenv("DATASET_TRIGRAM_COLUMNS", "").split(",") if c.strip()]
+# Por encima de este tamaño summary/correlation/trend se calculan por lotes (memoria constante)
+DATASET_STREAMING_THRESHOLD_BYTES = int(os.getenv("DATASET_STREAMING_THRESHOLD_BYTES", 256 * 1024 * 1024))
+# Máximo de periodos de /trend (rango de fechas / freq); por encima se responde 400
+DATASET_TREND_MAX_PERIODS = int(os.getenv("DATASET_TREND_MAX_PERIODS", 100000))
+# Procesos del pool de cálculo analítico por worker web (0 = calcular en el propio worker).
+# Cada proceso es un intérprete Django completo: la instancia tiene WEB_CONCURRENCY x este valor
+DATASET_COMPUTE_WORKERS = int(os.getenv("DATASET_COMPUTE_WORKERS", 1))
+# Trabajos admitidos a la vez (en ejecución + en cola); por encima se responde 429
+DATASET_COMPUTE_MAX_QUEUE = int(os.getenv("DATASET_COMPUTE_MAX_QUEUE", 8))
+# Coste estimado en vuelo (bytes de datasets) por encima del cual se responde 429
+DATASET_COMPUTE_MAX_COST_BYTES = int(os.getenv("DATASET_COMPUTE_MAX_COST_BYTES", 2 * 1024 * 1024 * 1024))
+# Caché de tablas repartida entre los procesos del pool (0 = sin caché); se suma a DATASET_CACHE_MAX_BYTES
+DATASET_COMPUTE_CACHE_MAX_BYTES = int(os.getenv("DATASET_COMPUTE_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+# Segundos máximos de un cálculo (por debajo del timeout de gunicorn); al vencer se interrumpe y el pool se renueva
+DATASET_COMPUTE_TIMEOUT = float(os.getenv("DATASET_COMPUTE_TIMEOUT", 110))
+# Vistas de lectura nativas async (preview, summary, trend...); activar al servir axi.asgi con uvicorn
+DATASET_ASYNC_VIEWS = os.getenv("DATASET_ASYNC_VIEWS", "false").lower() == "true"
+# Reintentos de webhooks (Nexus, Echo) ante errores de red, timeouts, 429 y 5xx
+DATASET_WEBHOOK_RETRIES = int(os.getenv("DATASET_WEBHOOK_RETRIES", 3))
+# Espera base y máxima (segundos) del backoff exponencial con jitter entre reintentos
+DATASET_WEBHOOK_BACKOFF = float(os.getenv("DATASET_WEBHOOK_BACKOFF", 0.5))
+DATASET_WEBHOOK_MAX_BACKOFF = float(os.getenv("DATASET_WEBHOOK_MAX_BACKOFF", 10))
+# Conexiones keep-alive por host del cliente de webhooks
+DATASET_WEBHOOK_POOL_SIZE = int(os.getenv("DATASET_WEBHOOK_POOL_SIZE", 4))
+# /health/integrations: segundos que un resultado se sirve sin volver a sondear (máximo un sondeo por destino
+# en ese intervalo), antigüedad máxima servida, espera total cuando no hay resultado y timeout de cada sondeo
+DATASET_HEALTH_TTL = float(os.getenv("DATASET_HEALTH_TTL", 15))
+DATASET_HEALTH_MAX_STALE = float(os.getenv("DATASET_HEALTH_MAX_STALE", 300))
+DATASET_HEALTH_DEADLINE = float(os.getenv("DATASET_HEALTH_DEADLINE", 1))
+DATASET_HEALTH_PROBE_TIMEOUT = float(os.getenv("DATASET_HEALTH_PROBE_TIMEOUT", 2))
+# /health/ready: segundos que se reutiliza el resultado de los sondeos de BD y storage, y objeto de storage
+# cuya metadata se consulta (no hace falta que exista; nunca se lista el bucket)
+DATASET_HEALTH_READY_TTL = float(os.getenv("DATASET_HEALTH_READY_TTL", 5))
+DATASET_HEALTH_STORAGE_PROBE = os.getenv("DATASET_HEALTH_STORAGE_PROBE", "health/probe")
 
 # ============================================================================
 # DEBUG: MOSTRAR CONFIGURACIÓN ACTUAL
@@ -10,4 +10,4 @@ PORT=${PORT:-8000}
 
 # Gunicorn para producción
 exec gunicorn axi.wsgi:application \
-  --bind 0.0.0.0:$PORT --workers ${WEB_CONCURRENCY:-3} --timeout 120
+  --bind 0.0.0.0:$PORT --workers ${WEB_CONCURRENCY:-3} --threads ${GUNICORN_THREADS:-4} --timeout 120
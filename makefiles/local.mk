@@ -58,6 +58,9 @@ local-test-oauth2:
 local-test-missing:
 	bash scripts/test_missing_endpoints.sh local
 
+local-test-webhooks:
+	.venv/bin/python manage.py test apps.datasets
+
 local-test-celery:
 	curl -s http://localhost:5555/api/workers  # Flower API
 	.venv/bin/python -c "from axi.celery import app; print(app.control.inspect().active())"